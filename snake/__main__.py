@@ -5,6 +5,8 @@ import pygame_menu
 
 from settings import *
 from logics import Controller, TestController
+from loop import FixedTimestepLoop
+from replay import ReplayRecorder
 
 from helpers import get_random_rgb_tuple
 from exceptions import GameOverException
@@ -24,23 +26,36 @@ def start_game(**kwargs):
 
     # Главный контроллер
     controller = Controller(window, **kwargs)
+    recorder = ReplayRecorder(controller.game) if REPLAY_PATH else None
+    loop = FixedTimestepLoop(uncapped=UNCAPPED_SIMULATION)
 
     # Цикл игры
     while True:
-        # Держим цикл на правильной скорости
-        clock.tick(FPS)
+        # Ограничиваем частоту кадров (такты игры от нее не зависят); без
+        # ограничения тактов кадры выводятся между ними
+        if not loop.uncapped:
+            clock.tick(FPS)
         try:
-            # Обновление
-            controller.update()
-            # После отрисовки всего, переворачиваем экран
-            pygame.display.flip()
+            controller.check_events()
+            # Выполняем такты игры, накопившиеся с прошлого кадра
+            loop.run_ticks(controller.step)
+            controller.render(loop.alpha)
+            # После отрисовки всего, выводим кадр на экран
+            controller.update_display()
         except GameOverException as e:
             game_over_message = str(e)
             break
 
         if not controller.is_running:
+            controller.dump_profile()
+            if recorder:
+                recorder.save(REPLAY_PATH)
             sys.exit()
 
+    controller.dump_profile()
+    if recorder:
+        recorder.save(REPLAY_PATH)
+
     menu_after_dead(game_over_message)
 
 
@@ -0,0 +1,141 @@
+import abc
+import math
+from array import array
+
+from spatial import RectGrid
+
+
+def cast_rays(snake, angles, length, samples, grid, game_rect, out, start=0):
+    """Лучи от головы змеи под углами angles (относительно направления
+    движения).
+
+    Для каждого луча в out (с позиции start) записывается близость
+    препятствия - других змей из сетки grid или границы поля: 1 - доля
+    длины луча до первой проверенной точки с препятствием (из samples точек
+    на луче), 0 - препятствия нет.
+    """
+    head_x, head_y = snake.head_xy
+    i = start
+    for delta in angles:
+        radians = math.radians(snake.angle + delta)
+        dx = math.cos(radians) * length / samples
+        dy = math.sin(radians) * length / samples
+        proximity = 0.0
+        for step in range(1, samples + 1):
+            x, y = head_x + dx * step, head_y + dy * step
+            if (not game_rect.collidepoint(x, y) or
+                    grid.collidepoint(x, y, exclude_owner=snake)):
+                proximity = 1 - (step - 1) / samples
+                break
+        out[i] = proximity
+        i += 1
+    return out
+
+
+class BotsObservations:
+    """Наблюдения ботов на такте, общие для всех политик.
+
+    Сетка прямоугольников змей строится при первом обращении, один раз за
+    такт.
+    """
+
+    def __init__(self, game_rect, build_rects_grid):
+        """
+        :param build_rects_grid: Функция построения сетки прямоугольников
+            змей (владелец прямоугольника - змея)
+        """
+        self.game_rect = game_rect
+        self.build_rects_grid = build_rects_grid
+        self._rects_grid = None
+
+    @property
+    def rects_grid(self):
+        if self._rects_grid is None:
+            self._rects_grid = self.build_rects_grid()
+        return self._rects_grid
+
+    def get_rays(self, bots, angles, length=100, samples=4):
+        """Лучи ботов (cast_rays) одним массивом: len(angles) чисел на
+        бота."""
+        out = array('d', bytes(8 * len(angles) * len(bots)))
+        grid = self.rects_grid
+        for number, bot in enumerate(bots):
+            cast_rays(bot, angles, length, samples, grid, self.game_rect,
+                      out, number * len(angles))
+        return out
+
+
+class BotPolicy(abc.ABC):
+    """Политика управления ботами.
+
+    За такт политика вызывается один раз со всеми своими ботами и
+    возвращает для каждого действие (поворот, ускорение): поворот - угол в
+    градусах (ограничивается max_turning_angle змеи) или None, ускорение -
+    True, False или None (не менять). Действия применяет GameLogic
+    (BotSnake.apply_action), поэтому политика не зависит от порядка ботов.
+    """
+
+    @abc.abstractmethod
+    def get_actions(self, bots, foods_counts, observations):
+        """
+        :param foods_counts: Количество съеденной ботами на такте еды
+        :param observations: Наблюдения такта (BotsObservations)
+        :return: Список действий по числу ботов
+        """
+        pass
+
+
+class FoodOnlyPolicy(BotPolicy):
+    """Движение к еде без проверки препятствий (например, для ботов далеко
+    от игроков)."""
+
+    def get_actions(self, bots, foods_counts, observations):
+        return [(bot.get_food_turn(food_count), None)
+                for bot, food_count in zip(bots, foods_counts)]
+
+
+class BotsAI(BotPolicy):
+    """Пакетный выбор направления ботов (политика по умолчанию).
+
+    Прямоугольники всех змей один раз за такт собираются в общую сетку, по
+    которой за один проход проверяются пробные точки всех ботов. Затем каждый
+    бот выбирает действие: поворот от препятствия или движение к еде.
+    """
+    # Размер ячейки сетки прямоугольников змей
+    rects_grid_cell_size = 100
+
+    def __init__(self, snake_container):
+        self.snake_container = snake_container
+
+    def build_rects_grid(self):
+        """Сетка прямоугольников всех змей."""
+        grid = RectGrid(self.rects_grid_cell_size)
+        for snake, rectangles in self.snake_container.snakes_rectangles:
+            for rect in rectangles:
+                grid.insert(rect, snake)
+        return grid
+
+    def check_probes(self, bots, grid):
+        """Пробные точки ботов и углы точек без препятствий."""
+        probes = [bot.get_probes() for bot in bots]
+        normal_angles = [
+            {
+                delta for delta, (x, y) in bot_probes
+                if not grid.collidepoint(x, y, exclude_owner=bot)
+                and bot.game_rect.collidepoint(x, y)
+            }
+            for bot, bot_probes in zip(bots, probes)
+        ]
+        return probes, normal_angles
+
+    def get_actions(self, bots, foods_counts, observations):
+        probes, normal_angles = self.check_probes(
+            bots, observations.rects_grid)
+        actions = []
+        for bot, bot_probes, bot_normal_angles, food_count in zip(
+                bots, probes, normal_angles, foods_counts):
+            turn = bot.get_obstacles_turn(bot_probes, bot_normal_angles)
+            if turn is None:
+                turn = bot.get_food_turn(food_count)
+            actions.append((turn, None))
+        return actions
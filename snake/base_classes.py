@@ -1,52 +1,63 @@
 import abc
 import functools
 import random
+from array import array
 
 from settings import *
 from helpers import *
+from render import sprite_cache
 
 
 class Drawable(abc.ABC):
     """Объект, который можно отрисовать на экране"""
+    __slots__ = ()
 
     @abc.abstractmethod
-    def draw(self, **kwargs):
-        """Отрисовка объекта на экране."""
+    def draw(self, win, **kwargs):
+        """Отрисовка объекта на поверхности."""
         pass
 
 
 class AbstractFigure(Drawable):
     """Абстрактная фигура."""
+    __slots__ = ()
     # Цвет
     color = WHITE
 
-    def __init__(self, win, pos, color=None, **kwargs):
+    def __init__(self, pos, color=None, **kwargs):
         """
-        :param win: Окно
         :param pos: Позиция фигуры
         """
-        self.win = win
         self.color = color if color else self.color
         self.x, self.y = pos
 
-    def set_random_positions(self):
+    def set_random_positions(self, rng=random):
         """Установка случайных координат."""
-        self.x = random.randint(0, WIDTH)
-        self.y = random.randint(0, HEIGHT)
+        self.x = rng.randint(0, WIDTH)
+        self.y = rng.randint(0, HEIGHT)
 
 
 class Circle(AbstractFigure):
     """Круг."""
+    __slots__ = ()
     # Радиус круга
     radius = 1
 
-    def __init__(self, win, radius=None, **kwargs):
-        super().__init__(win, **kwargs)
+    def __init__(self, radius=None, **kwargs):
+        super().__init__(**kwargs)
         self.radius = radius if radius else self.radius
 
-    def draw(self, **kwargs):
-        """Отрисовка круга."""
-        pygame.draw.circle(self.win, self.color, (self.x, self.y), self.radius)
+    def reset(self, pos, color=None, radius=None, **kwargs):
+        """Повторная инициализация круга (при взятии из пула)."""
+        self.x, self.y = pos
+        self.color = color if color else type(self).color
+        self.radius = radius if radius else type(self).radius
+
+    def draw(self, win, offset=(0, 0), **kwargs):
+        """Отрисовка круга (со смещением координат offset) готовым
+        изображением из кэша."""
+        sprite_cache.draw_circle(
+            win, self.color, (self.x, self.y), self.radius, offset)
 
     @property
     def xy(self):
@@ -86,21 +97,121 @@ class Circle(AbstractFigure):
         )
 
 
+class SnakeCircle(Circle):
+    """Элемент тела змеи.
+
+    Легковесное представление: координаты элемента хранятся в массивах змеи,
+    а радиус и цвет - один раз в самой змее.
+    """
+    __slots__ = ('snake', 'index')
+
+    def __init__(self, snake, index):
+        self.snake = snake
+        self.index = index
+
+    @property
+    def x(self):
+        return self.snake.xs[self.index]
+
+    @x.setter
+    def x(self, value):
+        self.snake.xs[self.index] = value
+        self.snake.update_bounding_box()
+
+    @property
+    def y(self):
+        return self.snake.ys[self.index]
+
+    @y.setter
+    def y(self, value):
+        self.snake.ys[self.index] = value
+        self.snake.update_bounding_box()
+
+    @property
+    def radius(self):
+        return self.snake.radius
+
+    @property
+    def color(self):
+        return self.snake.color
+
+
+class ObjectsPool:
+    """Пул объектов для повторного использования.
+
+    Объекты класса должны поддерживать reset(obj_id, **kwargs) с теми же
+    параметрами, что и конструктор.
+    """
+
+    def __init__(self, obj_class, max_size=1000):
+        self.obj_class = obj_class
+        self.max_size = max_size
+        self.free = []
+        # Количество созданных, взятых повторно и возвращенных объектов
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+
+    def acquire(self, obj_id, **kwargs):
+        """Получение объекта (из пула, если есть свободные)."""
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(obj_id, **kwargs)
+            self.reused += 1
+        else:
+            obj = self.obj_class(obj_id, **kwargs)
+            self.created += 1
+        return obj
+
+    def release(self, obj):
+        """Возвращение объекта в пул."""
+        if len(self.free) < self.max_size:
+            self.free.append(obj)
+            self.released += 1
+
+    def get_stats(self):
+        """Статистика пула."""
+        return {
+            'created': self.created,
+            'reused': self.reused,
+            'released': self.released,
+            'free': len(self.free),
+        }
+
+
 class ObjectsContainer(Drawable):
-    """Контейнер для объектов."""
-    max_id = 10000
-    current_id = 0
+    """Контейнер для объектов.
+
+    id выдаются отдельно в каждом контейнере: id удаленных объектов
+    используются повторно, поэтому id уникальны среди объектов контейнера.
+    """
     obj_class = None
+    # Размер пула удаленных объектов (0 - объекты не используются повторно)
+    pool_size = 0
 
-    def __init__(self, win, count=0):
-        self.win = win
+    def __init__(self, count=0):
         self.objects = {}
+        self.last_id = 0
+        # Освободившиеся id
+        self.free_ids = []
+        self.pool = (
+            ObjectsPool(self.obj_class, self.pool_size) if self.pool_size
+            else None)
         if count:
             self.add_multiple_objs(count, force=True)
 
     def get_new_obj(self, **kwargs):
         """Получение нового объекта"""
-        return self.obj_class(self.get_id(), self.win, **kwargs)
+        if self.pool is not None:
+            return self.pool.acquire(self.get_id(), **kwargs)
+        return self.obj_class(self.get_id(), **kwargs)
+
+    def release_obj(self, obj):
+        """Освобождение id удаленного (или не добавленного) объекта и
+        возвращение объекта в пул."""
+        self.free_ids.append(obj.id)
+        if self.pool is not None:
+            self.pool.release(obj)
 
     def add_obj(self, obj):
         """Добавление объекта"""
@@ -117,21 +228,27 @@ class ObjectsContainer(Drawable):
         """Добавление нескольких элементв"""
         return [self.add_new_obj(**kwargs) for _ in range(count)]
 
-    @classmethod
-    def get_id(cls):
+    def get_id(self):
         """Получение нового id для объекта."""
-        cls.current_id += 1
-        return (cls.current_id + 1) % cls.max_id
+        if self.free_ids:
+            return self.free_ids.pop()
+        self.last_id += 1
+        return self.last_id
 
-    def draw(self, **kwargs):
+    def draw(self, win, **kwargs):
         """Отрисовка объектов."""
         for obj in self.objects.values():
-            obj.draw()
+            obj.draw(win, **kwargs)
 
     def delete_by_id(self, obj_id):
         """Удаление объекта по id."""
-        if obj_id in self.objects:
-            self.objects.pop(obj_id)
+        obj = self.objects.pop(obj_id, None)
+        if obj is not None:
+            self.release_obj(obj)
+
+    def get_pool_stats(self):
+        """Статистика пула объектов (None, если пула нет)."""
+        return self.pool.get_stats() if self.pool is not None else None
 
     def has_object(self, obj_id):
         """Проверка наличия объекта."""
@@ -156,38 +273,60 @@ class BaseSnake(Drawable):
     # Рисовать ли треугольники для расчёта коллизий
     draw_collision_rectangles = DRAW_COLLISION_RECTANGLES
 
-    def __init__(self, snake_id, win, **kwargs):
+    def __init__(self, snake_id, **kwargs):
         self.id = snake_id
-        self.win = win
         self.angle = kwargs.get('angle', self.angle)
         self.start_pos = kwargs.get('start_pos', self.default_start_pos)
         self.color = kwargs.get('color') or self.default_color
         self.radius = 10
         self.is_alive = True
+        # Такт игры, на котором змея появилась
+        self.birth_tick = kwargs.get('birth_tick', 0)
         self.turning_direction = None
         self.is_boost_enabled = False
         self.current_speed = self.usual_speed
 
-        head = self.get_circle(pos=self.start_pos, color=self.color)
-        self.circles = [head]
+        # Координаты элементов тела (голова - первый элемент)
+        self.xs = array('d', (self.start_pos[0],))
+        self.ys = array('d', (self.start_pos[1],))
+        # Крайние координаты центров элементов (обновляются в move)
+        self.bounding_box = None
         self.add_tail(2, initial=True)
 
-    def get_circle(self, pos, **kwargs):
-        """Получение круга с нужными параметрами."""
-        circle_dict = dict(radius=self.radius, pos=pos, color=self.color)
-        circle_dict.update(kwargs)
-        return Circle(self.win, **circle_dict)
+    @property
+    def length(self):
+        """Количество элементов тела."""
+        return len(self.xs)
+
+    @property
+    def points(self):
+        """Координаты элементов тела."""
+        return zip(self.xs, self.ys)
+
+    @property
+    def circles(self):
+        """Элементы тела в виде кругов (новый список при каждом обращении,
+        в расчетах такта используются массивы координат)."""
+        return [SnakeCircle(self, i) for i in range(len(self.xs))]
 
     @property
     def head(self):
         """Голова."""
-        return self.circles[0]
+        return SnakeCircle(self, 0)
 
     @property
     def head_xy(self):
         """Координаты головы."""
-        head = self.head
-        return head.x, head.y
+        return self.xs[0], self.ys[0]
+
+    def get_bounding_box(self):
+        """Крайние координаты центров элементов тела."""
+        return self.bounding_box
+
+    def update_bounding_box(self):
+        """Пересчет крайних координат по всем элементам."""
+        self.bounding_box = Coordinates(min(self.xs), max(self.xs),
+                                        min(self.ys), max(self.ys))
 
     @property
     def double_r_coef(self):
@@ -196,58 +335,75 @@ class BaseSnake(Drawable):
     def add_tail(self, count=1, initial=False):
         """Добавление элементов в хвост."""
         for _ in range(count):
-            last_circle = self.circles[-1]
-            radian_angle = math.radians(self.angle)
+            x, y = self.xs[-1], self.ys[-1]
             if initial:
-                pos = (
-                    last_circle.x - self.double_r_coef * math.cos(radian_angle),
-                    last_circle.y - self.double_r_coef * math.sin(radian_angle)
-                )
-            else:
-                pos = last_circle.xy
-            self.circles.append(self.get_circle(pos=pos))
+                radian_angle = math.radians(self.angle)
+                x -= self.double_r_coef * math.cos(radian_angle)
+                y -= self.double_r_coef * math.sin(radian_angle)
+            self.xs.append(x)
+            self.ys.append(y)
 
+        self.update_bounding_box()
         self.update_radius(self.radius * self.radius_increase_coef)
 
     def update_radius(self, new_radius):
-        """Обновить радиус."""
+        """Обновить радиус (общий для всех элементов)."""
         self.radius = min(new_radius, self.max_radius)
-        for circle in self.circles:
-            circle.radius = self.radius
 
     def update_current_speed(self):
         """Обновить текущую скорость с учетом ускорения/замедления."""
         if self.is_boost_enabled:
-            self.current_speed = self.current_speed + self.acceleration / FPS
+            self.current_speed = (
+                self.current_speed + self.acceleration / TICK_RATE)
             if self.current_speed > self.max_speed_with_boost:
                 self.current_speed = self.max_speed_with_boost
         elif self.current_speed == self.usual_speed:
             return
         else:
-            self.current_speed = self.current_speed - self.acceleration / FPS
+            self.current_speed = (
+                self.current_speed - self.acceleration / TICK_RATE)
             if self.current_speed < self.usual_speed:
                 self.current_speed = self.usual_speed
 
     def move(self):
-        """Движение вперед."""
-        if not self.circles:
-            return
-
-        prev_x = prev_y = None
-        for i, circle in enumerate(self.circles):
-            if i == 0:
-                circle.x, circle.y = get_new_point_pos(
-                    *circle.xy, self.angle, self.current_speed)
-                prev_x, prev_y = circle.x, circle.y
-                continue
+        """Движение вперед.
 
-            distance = get_points_distance(*circle.xy, prev_x, prev_y)
-            if distance > 0.5 * self.radius:
-                angle = get_angle_of_points(prev_x, prev_y, *circle.xy)
-                circle.x, circle.y = get_new_point_pos(
-                    prev_x, prev_y, angle, self.double_r_coef)
+        Голова сдвигается по направлению движения, а каждый следующий элемент,
+        отставший от предыдущего больше чем на половину радиуса, подтягивается
+        к нему по прямой на расстояние double_r_coef (без тригонометрии:
+        через нормированный вектор до предыдущего элемента). Заодно
+        обновляются крайние координаты элементов.
+        """
+        xs, ys = self.xs, self.ys
+        if not xs:
+            return
 
-            prev_x, prev_y = circle.xy
+        prev_x, prev_y = xs[0], ys[0] = get_new_point_pos(
+            xs[0], ys[0], self.angle, self.current_speed)
+        left = right = prev_x
+        top = bottom = prev_y
+        sqr_min_distance = (0.5 * self.radius) ** 2
+        distance = self.double_r_coef
+        sqrt = math.sqrt
+        for i in range(1, len(xs)):
+            dx = xs[i] - prev_x
+            dy = ys[i] - prev_y
+            sqr_distance = dx * dx + dy * dy
+            if sqr_distance > sqr_min_distance:
+                coef = distance / sqrt(sqr_distance)
+                prev_x = xs[i] = prev_x + dx * coef
+                prev_y = ys[i] = prev_y + dy * coef
+            else:
+                prev_x, prev_y = xs[i], ys[i]
+            if prev_x < left:
+                left = prev_x
+            elif prev_x > right:
+                right = prev_x
+            if prev_y < top:
+                top = prev_y
+            elif prev_y > bottom:
+                bottom = prev_y
+        self.bounding_box = Coordinates(left, right, top, bottom)
 
     @property
     def turning_angle(self):
@@ -279,17 +435,51 @@ class BaseSnake(Drawable):
         """Установка/отключение ускорения в сторону."""
         self.is_boost_enabled = enable_boost
 
-    def draw(self, **kwargs):
-        for circle in reversed(self.circles):
-            circle.draw()
+    def draw(self, win, points=None, offset=(0, 0), **kwargs):
+        """Отрисовка змеи (можно передать координаты элементов, например,
+        интерполированные между тактами)."""
+        self.draw_body(win, points, offset)
+        self.draw_overlays(win, offset)
+
+    def draw_body(self, win, points=None, offset=(0, 0)):
+        """Отрисовка элементов тела (со смещением координат offset)."""
+        points = list(self.points if points is None else points)
+        # Голова рисуется последней, поверх остальных элементов
+        points.reverse()
+        sprite_cache.draw_circles(
+            win, self.color, self.radius, points, offset)
+
+    def draw_overlays(self, win, offset=(0, 0)):
+        """Отрисовка вспомогательных объектов поверх тела."""
+        if self.draw_collision_rectangles:
+            for rectangle in self.get_collision_rectangles():
+                self.draw_rect(win, rectangle.move(offset), RED)
+
+    def get_overlays_rect(self):
+        """Область вспомогательных объектов (None, если их нет)."""
+        if not self.draw_collision_rectangles:
+            return None
+        rects = self.get_collision_rectangles()
+        return rects[0].unionall(rects[1:]).inflate(2, 2)
+
+    def get_lines_rect(self, points):
+        """Область линий из головы в точки (None, если точек нет)."""
+        if not points:
+            return None
+        xs = [x for x, _ in points] + [self.xs[0]]
+        ys = [y for _, y in points] + [self.ys[0]]
+        left, top = int(min(xs)) - 1, int(min(ys)) - 1
+        return pygame.Rect(left, top, int(max(xs)) + 2 - left,
+                           int(max(ys)) + 2 - top)
 
     def find_collision_with_other_snake(self, snake, exclude_self=False):
         """Нахождение столкновения головы этой змеи с другой."""
         if exclude_self and snake is self:
             return
 
-        for i, circle in enumerate(snake.circles):
-            if circle.get_distance_to_circle(self.head) < (
+        head_x, head_y = self.head_xy
+        for i, (x, y) in enumerate(snake.points):
+            if get_points_distance(x, y, head_x, head_y) < (
                     self.radius + snake.radius):
                 # Пропускаем коллизии, если это сама же змея и её голова
                 if not (snake is self and i <= 1):
@@ -297,37 +487,50 @@ class BaseSnake(Drawable):
 
     def get_collision_rectangles(self, step=5):
         """Получение прямоугольников для определения коллизий."""
-        rects = [circle.rect for circle in self.circles]
-        rectangles = [
+        half_radius = self.radius / 2
+        rects = [
+            pygame.Rect(x - half_radius, y - half_radius,
+                        (x + half_radius) - (x - half_radius),
+                        (y + half_radius) - (y - half_radius))
+            for x, y in self.points
+        ]
+        return [
             functools.reduce(pygame.Rect.union, rects[i * step: (i + 1) * step])
             for i in range(math.ceil(len(rects) / step))
         ]
-        if self.draw_collision_rectangles:
-            for r in rectangles:
-                self.draw_rect(r, RED)
-        return rectangles
 
     def get_new_position_from_head(self, angle, distance):
         """Получение новой позиции, начиная от головы."""
         return get_new_point_pos(*self.head_xy, angle, distance)
 
-    def draw_rect(self, rectangle, color):
-        """Нарисовать прямоугольник на экране."""
-        pygame.draw.rect(self.win, color, rectangle, 1)
+    def draw_rect(self, win, rectangle, color):
+        """Нарисовать прямоугольник на поверхности."""
+        pygame.draw.rect(win, color, rectangle, 1)
 
-    def draw_line_from_head(self, pos, color=None):
+    def draw_line_from_head(self, win, pos, color=None, offset=(0, 0)):
         """Нарисовать линию из точки головы"""
-        pygame.draw.line(self.win, color or self.default_color, self.head_xy, pos)
-
-    def update(self, **kwargs):
-        """Базовое обновление змеи (движение и поедание еды."""
-        food_count = kwargs.get('food_count', 0)
+        offset_x, offset_y = offset
+        head_x, head_y = self.head_xy
+        pygame.draw.line(win, color or self.default_color,
+                         (int(head_x) + offset_x, int(head_y) + offset_y),
+                         (int(pos[0]) + offset_x, int(pos[1]) + offset_y))
+
+    def update_direction(self, **kwargs):
+        """Обновление скорости и направления движения."""
         self.update_current_speed()
         self.change_angle()
+
+    def update_position(self, food_count=0):
+        """Движение и рост после поедания еды."""
         self.move()
         if food_count:
             self.add_tail(food_count)
 
+    def update(self, **kwargs):
+        """Базовое обновление змеи (движение и поедание еды)."""
+        self.update_direction(**kwargs)
+        self.update_position(kwargs.get('food_count', 0))
+
 
 class BaseController:
     """Базовый класс контроллера."""
@@ -336,13 +539,24 @@ class BaseController:
 
     def __init__(self, win):
         self.win = win
-        self.game_surface = pygame.Surface((WIDTH, HEIGHT))
         self.is_running = True
 
     def update(self):
         """Обновление данных."""
         self.check_events()
-        self.game_surface.fill(self.background_color)
+        self.step()
+        self.render()
+
+    def step(self):
+        """Один такт игры."""
+        pass
+
+    def render(self, alpha=1):
+        """Отрисовка кадра.
+
+        :param alpha: Доля времени, прошедшая с последнего такта (от 0 до 1)
+        """
+        pass
 
     def handle_event(self, event):
         """Обработка событий."""
@@ -0,0 +1,172 @@
+"""Бенчмарк такта игры без окна.
+
+Для каждого параметра (количество ботов, длина змей, количество еды, размер
+поля) по очереди перебираются значения при остальных параметрах по
+умолчанию. Результаты выводятся в JSON, чтобы их можно было сравнивать между
+версиями.
+
+Запуск из каталога snake:
+    python benchmark.py -o bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from settings import *
+from logics import GameLogic
+from profiling import PhaseProfiler, get_percentile
+from render import GameRenderer, TiledSurface
+
+# Параметры по умолчанию
+DEFAULT_CONFIG = dict(
+    bots=8, length=3, food=INITIAL_FOOD_COUNT, map_size=WIDTH,
+)
+# Перебираемые значения параметров
+DEFAULT_SWEEPS = dict(
+    bots=[4, 16, 64],
+    length=[3, 50, 200],
+    food=[200, 1000, 5000],
+    map_size=[1500, 3000, 5000],
+)
+
+
+def create_game(config, seed):
+    """Создание игры без игрока по параметрам бенчмарка."""
+    game = GameLogic(
+        with_player=False, bots_count=config['bots'], food_count=config['food'],
+        width=config['map_size'], height=config['map_size'], seed=seed,
+    )
+    for snake in game.get_snakes():
+        if snake.length < config['length']:
+            snake.add_tail(config['length'] - snake.length)
+    return game
+
+
+def draw_frame(game, renderer):
+    """Отрисовка области окна вокруг головы первой змеи."""
+    snakes = game.get_snakes()
+    center = snakes[0].head_xy if snakes else game.game_rect.center
+    viewport = pygame.Rect(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+    viewport.center = center
+    viewport = viewport.clip(renderer.surface.get_rect())
+    renderer.draw(game, 1, viewport)
+
+
+def run_ticks(game, ticks, profiler=None, draw=True):
+    """Выполнение тактов игры. Возвращает длительности тактов в секундах."""
+    renderer = None
+    draw_func = draw_frame
+    if draw:
+        renderer = GameRenderer(TiledSurface(game.game_rect.size))
+        game.add_observer(renderer)
+        if profiler:
+            draw_func = profiler.wrap('draw', draw_frame)
+
+    durations = []
+    timer = time.perf_counter
+    for _ in range(ticks):
+        start = timer()
+        game.step()
+        if renderer:
+            draw_func(game, renderer)
+        durations.append(timer() - start)
+    return durations
+
+
+def measure_peak_memory(config, ticks, seed, draw=True):
+    """Пиковый объем памяти Python-объектов за прогон, в килобайтах."""
+    tracemalloc.start()
+    try:
+        run_ticks(create_game(config, seed), ticks, draw=draw)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def run_benchmark(config, ticks, seed, draw=True, memory=True):
+    """Прогон одного набора параметров."""
+    game = create_game(config, seed)
+    profiler = PhaseProfiler()
+    profiler.attach(game, GameLogic.profiled_phases)
+    durations = run_ticks(game, ticks, profiler, draw)
+    profiler.detach()
+
+    total = sum(durations)
+    return {
+        'config': dict(config, ticks=ticks, seed=seed, draw=draw),
+        'ticks_per_second': ticks / total,
+        'tick_ms': {
+            'mean': total * 1000 / ticks,
+            'p50': get_percentile(durations, 50) * 1000,
+            'p99': get_percentile(durations, 99) * 1000,
+            'max': max(durations) * 1000,
+        },
+        'phases': profiler.get_stats(),
+        'peak_memory_kb': (
+            measure_peak_memory(config, ticks, seed, draw) if memory else None),
+        'snakes_alive': len(game.get_snakes()),
+        'food_pool': game.food_container.get_pool_stats(),
+    }
+
+
+def get_configs(sweeps):
+    """Наборы параметров: каждый параметр перебирается отдельно."""
+    configs = []
+    for name, values in sweeps.items():
+        for value in values:
+            config = dict(DEFAULT_CONFIG, **{name: value})
+            if config not in configs:
+                configs.append(config)
+    return configs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    for name, values in DEFAULT_SWEEPS.items():
+        parser.add_argument(f'--{name.replace("_", "-")}', type=int,
+                            nargs='+', default=values, dest=name)
+    parser.add_argument('--no-draw', action='store_true',
+                        help='не замерять отрисовку')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='не замерять пиковую память (отдельный прогон)')
+    parser.add_argument('-o', '--output', help='файл для результатов JSON')
+    args = parser.parse_args(argv)
+
+    sweeps = {name: getattr(args, name) for name in DEFAULT_SWEEPS}
+    results = []
+    for config in get_configs(sweeps):
+        result = run_benchmark(config, args.ticks, args.seed,
+                               draw=not args.no_draw,
+                               memory=not args.no_memory)
+        results.append(result)
+        print(f'{config}: {result["ticks_per_second"]:.1f} ticks/s, '
+              f'p99 {result["tick_ms"]["p99"]:.2f} ms', file=sys.stderr)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
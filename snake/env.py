@@ -0,0 +1,236 @@
+"""Среда для обучения с подкреплением в стиле Gym.
+
+Агент управляет змеей игрока в игре без окна (GameLogic) против ботов.
+Действие - номер из ACTIONS (поворот и ускорение), наблюдение - плоский
+массив array('d'):
+    для каждого луча ray_angles (относительно направления движения) -
+        близость препятствия (1 - расстояние / ray_length, 0 - препятствия
+        нет): других змей или границы поля;
+    синус и косинус угла до еды, которую выбрал бы бот, и расстояние до нее
+        (доля ray_length, не больше 1);
+    текущая скорость (доля максимальной).
+Награда - количество съеденной за шаг еды, при гибели - death_reward.
+
+VecEnv выполняет шаги нескольких независимых игр в одном процессе и
+возвращает наблюдения всех игр одним плоским массивом.
+
+Запуск из каталога snake (замер шагов в секунду):
+    python env.py --envs 16 --steps 2000
+"""
+import argparse
+import json
+import math
+import random
+import time
+from array import array
+
+from helpers import DE
+from exceptions import GameOverException
+from ai import cast_rays
+from logics import BotSnake, GameLogic
+
+# Действия: (поворот, ускорение)
+ACTIONS = (
+    (None, False), (DE.LEFT, False), (DE.RIGHT, False),
+    (None, True), (DE.LEFT, True), (DE.RIGHT, True),
+)
+ACTIONS_INPUTS = tuple(
+    {'turning': turning, 'boost': boost} for turning, boost in ACTIONS)
+
+
+class SnakeEnv:
+    """Среда с одной игрой.
+
+    API как у gymnasium: reset() -> (наблюдение, info),
+    step(action) -> (наблюдение, награда, terminated, truncated, info).
+    """
+    ray_angles = BotSnake.probe_angles
+    ray_length = 100
+    # Количество проверяемых точек на луче
+    ray_samples = 4
+    death_reward = -1.0
+
+    def __init__(self, bots_count=4, food_count=100, width=1000, height=1000,
+                 max_steps=3000, frame_skip=1, seed=None):
+        """
+        :param max_steps: Максимальное количество шагов в эпизоде
+        :param frame_skip: Количество тактов игры на шаг (действие
+            повторяется)
+        :param seed: Зерно для зерен игр последовательных эпизодов
+        """
+        self.game_kwargs = dict(
+            bots_count=bots_count, food_count=food_count, width=width,
+            height=height)
+        self.max_steps = max_steps
+        self.frame_skip = frame_skip
+        self.rng = random.Random(seed)
+        self.observation_size = len(self.ray_angles) + 4
+        self.actions_count = len(ACTIONS)
+        self.game = None
+        self.steps = 0
+        self.episode_return = 0.0
+
+    def reset(self, seed=None):
+        """Начало нового эпизода."""
+        if seed is not None:
+            self.rng.seed(seed)
+        self.game = GameLogic(
+            with_player=True, seed=self.rng.getrandbits(32),
+            **self.game_kwargs)
+        self.steps = 0
+        self.episode_return = 0.0
+        return self.get_observation(), {'seed': self.game.seed}
+
+    def step(self, action):
+        reward, terminated, truncated, info = self.advance(action)
+        return self.get_observation(), reward, terminated, truncated, info
+
+    def advance(self, action):
+        """Шаг без построения наблюдения: (награда, terminated, truncated,
+        info)."""
+        game = self.game
+        snake = game.snake
+        length = snake.length
+        inputs = ACTIONS_INPUTS[action]
+        terminated = False
+        try:
+            for _ in range(self.frame_skip):
+                game.step(inputs)
+                inputs = None
+        except GameOverException:
+            terminated = True
+        reward = (self.death_reward if terminated
+                  else float(snake.length - length))
+        self.steps += 1
+        self.episode_return += reward
+        truncated = not terminated and self.steps >= self.max_steps
+        info = {}
+        if terminated or truncated:
+            info['episode'] = {'return': self.episode_return,
+                               'length': self.steps}
+        return reward, terminated, truncated, info
+
+    def get_observation(self, out=None, start=0):
+        """Наблюдение агента.
+
+        :param out: Массив, в который записывается наблюдение (с позиции
+            start), по умолчанию - новый
+        """
+        if out is None:
+            out = array('d', bytes(8 * self.observation_size))
+        game = self.game
+        snake = game.snake
+        ray_length = self.ray_length
+        # Та же сетка, что и у ботов; прямоугольники из кэша используются и
+        # на следующем такте игры
+        grid = game.bots_ai.build_rects_grid()
+        cast_rays(snake, self.ray_angles, ray_length, self.ray_samples, grid,
+                  game.game_rect, out, start)
+        head_x, head_y = snake.head_xy
+        i = start + len(self.ray_angles)
+
+        # Та же еда, что выбрал бы бот; поиск не меняет состояние игры (в
+        # отличие от FoodTargeting, который запоминает кандидатов)
+        food = game.food_container.get_nearest_food(
+            snake.head_xy, snake.angle)
+        if food is not None:
+            angle = (math.atan2(food.y - head_y, food.x - head_x) -
+                     math.radians(snake.angle))
+            distance = math.hypot(food.x - head_x, food.y - head_y)
+            out[i:i + 3] = array('d', (
+                math.sin(angle), math.cos(angle),
+                min(distance / ray_length, 1.0)))
+        else:
+            out[i:i + 3] = array('d', (0.0, 0.0, 1.0))
+        out[i + 3] = snake.current_speed / snake.max_speed_with_boost
+        return out
+
+
+class VecEnv:
+    """Несколько независимых сред, шаги которых выполняются вместе.
+
+    Наблюдения возвращаются одним массивом array('d') из
+    len(envs) * observation_size чисел (наблюдения сред подряд), награды и
+    признаки окончания - массивами по числу сред. Закончившийся эпизод
+    сразу начинается заново, и в наблюдениях возвращается первое
+    наблюдение нового эпизода (статистика закончившегося - в info).
+    """
+
+    def __init__(self, count, seed=0, **env_kwargs):
+        """
+        :param seed: Зерно первой среды (у следующих - seed + 1, ...)
+        """
+        self.envs = [SnakeEnv(seed=seed + i, **env_kwargs)
+                     for i in range(count)]
+        self.observation_size = self.envs[0].observation_size
+        self.actions_count = self.envs[0].actions_count
+        self.observations = array('d', bytes(8 * count * self.observation_size))
+
+    def __len__(self):
+        return len(self.envs)
+
+    def reset(self):
+        size = self.observation_size
+        infos = []
+        for number, env in enumerate(self.envs):
+            _, info = env.reset()
+            env.get_observation(self.observations, number * size)
+            infos.append(info)
+        return self.observations, infos
+
+    def step(self, actions):
+        """Шаг всех сред.
+
+        :param actions: Действия сред (последовательность чисел)
+        :return: (наблюдения, награды, terminated, truncated, infos)
+        """
+        count = len(self.envs)
+        size = self.observation_size
+        rewards = array('d', bytes(8 * count))
+        terminated = array('b', bytes(count))
+        truncated = array('b', bytes(count))
+        infos = []
+        for number, (env, action) in enumerate(zip(self.envs, actions)):
+            reward, env_terminated, env_truncated, info = env.advance(action)
+            rewards[number] = reward
+            terminated[number] = env_terminated
+            truncated[number] = env_truncated
+            if env_terminated or env_truncated:
+                env.reset()
+            env.get_observation(self.observations, number * size)
+            infos.append(info)
+        return self.observations, rewards, terminated, truncated, infos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--envs', type=int, default=16)
+    parser.add_argument('--steps', type=int, default=1000,
+                        help='количество шагов каждой среды')
+    parser.add_argument('--bots', type=int, default=4)
+    parser.add_argument('--frame-skip', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    envs = VecEnv(args.envs, seed=args.seed, bots_count=args.bots,
+                  frame_skip=args.frame_skip)
+    rng = random.Random(args.seed)
+    envs.reset()
+    episodes = []
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        actions = [rng.randrange(envs.actions_count) for _ in range(len(envs))]
+        infos = envs.step(actions)[-1]
+        episodes.extend(info['episode'] for info in infos if info)
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        'env_steps_per_second': args.envs * args.steps / seconds,
+        'episodes': len(episodes),
+        'mean_return': (
+            sum(e['return'] for e in episodes) / len(episodes) if episodes
+            else None),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
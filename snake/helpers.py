@@ -58,21 +58,25 @@ def normalize_angle(angle):
     return angle
 
 
-def get_random_pos(coef=0.1):
+def get_random_pos(coef=0.1, game_rect=None, rng=random):
     """Получение случайных координат.
 
-    Коэффицент нужен для отдаления от краев экрана.
+    Коэффицент нужен для отдаления от краев игрового поля (по умолчанию -
+    GameRect).
+
+    :param rng: Генератор случайных чисел (по умолчанию - модуль random)
     """
     assert coef < 0.5
+    width, height = (game_rect or GameRect).size
     return (
-        random.randint(WIDTH * coef, WIDTH * (1 - coef)),
-        random.randint(HEIGHT * coef, HEIGHT * (1 - coef))
+        rng.randint(int(width * coef), int(width * (1 - coef))),
+        rng.randint(int(height * coef), int(height * (1 - coef)))
     )
 
 
-def get_random_rgb_tuple():
+def get_random_rgb_tuple(rng=random):
     """Возвращает кортеж с числами RGB для случайного цвета."""
-    return tuple([random.randint(0, 255) for _ in range(3)])
+    return tuple([rng.randint(0, 255) for _ in range(3)])
 
 
 class DirectionEnum:
@@ -104,6 +108,20 @@ class DirectionEnum:
 
 DE = DirectionEnum
 
+
+class DeathCauseEnum:
+    """Причины гибели змеи"""
+
+    # Выход за границы игрового поля
+    BORDER = 'border'
+    # Голова врезалась в тело другой змеи
+    BODY = 'body'
+    # Лобовое столкновение голов
+    HEAD_ON = 'head_on'
+
+    values = (BORDER, BODY, HEAD_ON)
+
+
 # Маппинг нажатых клавиш и коэффициентов для увеличенение/уменьшения координат
 KEY_SIGN_MAPPING = {
     pygame.K_LEFT: -1,
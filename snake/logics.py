@@ -1,6 +1,6 @@
-import datetime
 import random
 import sys
+from collections import namedtuple
 from functools import partial
 
 import pygame
@@ -8,7 +8,15 @@ import pygame
 from settings import *
 from helpers import *
 from base_classes import Circle, ObjectsContainer, BaseSnake, BaseController
+from ai import BotsAI, BotsObservations
 from exceptions import GameOverException
+from profiling import PhaseProfiler
+from render import (
+    GameRenderer, MiniMapRenderer, ProfilerOverlay, TiledSurface,
+)
+from scheduler import TickScheduler
+from targeting import FoodTargeting
+from spatial import SpatialHashGrid
 
 
 class Food(Circle):
@@ -16,9 +24,19 @@ class Food(Circle):
     color = PURPLE
     radius = 5
 
-    def __init__(self, food_id, win, **kwargs):
-        kwargs.setdefault('pos', get_random_pos(0.05))
-        super().__init__(win, **kwargs)
+    def __init__(self, food_id, **kwargs):
+        if 'pos' not in kwargs:
+            kwargs['pos'] = get_random_pos(0.05)
+        super().__init__(**kwargs)
+        self.id = food_id
+        # Номер добавления в контейнер (FoodContainer.insert_version):
+        # вместе с id однозначно определяет еду, даже взятую из пула
+        self.generation = 0
+
+    def reset(self, food_id, **kwargs):
+        if 'pos' not in kwargs:
+            kwargs['pos'] = get_random_pos(0.05)
+        super().reset(**kwargs)
         self.id = food_id
 
     def __repr__(self):
@@ -31,21 +49,65 @@ class FoodContainer(ObjectsContainer):
     # Коэффицент для соотношения угла поворота и дистанции для поиска еды
     ANGLE_TO_DISTANCE_COEF = 1
     max_food_count = MAX_FOOD_COUNT
+    pool_size = 1000
+    # Размер ячейки сетки для поиска еды
+    grid_cell_size = 50
+
+    def __init__(self, count=0, game_rect=GameRect, rng=random):
+        self.game_rect = game_rect
+        self.rng = rng
+        self.grid = SpatialHashGrid(self.grid_cell_size)
+        # Максимальный радиус добавленной еды (для поиска съеденной)
+        self.max_food_radius = Food.radius
+        # Увеличивается при каждом добавлении еды
+        self.insert_version = 0
+        # Функции, вызываемые с едой при её добавлении и удалении
+        self.listeners = []
+        super().__init__(count)
+
+    def get_new_obj(self, **kwargs):
+        if 'pos' not in kwargs:
+            kwargs['pos'] = get_random_pos(0.05, self.game_rect, self.rng)
+        return super().get_new_obj(**kwargs)
 
     def add_obj(self, obj, force=False):
         if force or len(self.objects) < self.max_food_count:
+            self.grid.insert(obj.id, obj.x, obj.y, obj)
+            self.max_food_radius = max(self.max_food_radius, obj.radius)
+            self.insert_version += 1
+            obj.generation = self.insert_version
+            for listener in self.listeners:
+                listener(obj)
             return super().add_obj(obj)
         return False
 
+    def delete_by_id(self, obj_id):
+        obj = self.objects.get(obj_id)
+        if obj is not None:
+            self.grid.remove(obj_id)
+            for listener in self.listeners:
+                listener(obj)
+        super().delete_by_id(obj_id)
+
     def add_new_obj(self, force=False, **kwargs):
         obj = self.get_new_obj(**kwargs)
-        result = self.add_obj(obj, force)
-        return obj if result else None
+        if not self.add_obj(obj, force):
+            self.release_obj(obj)
+            return None
+        return obj
+
+    def is_actual(self, food, generation):
+        """Проверка, что еда не съедена и не использована повторно."""
+        return (self.objects.get(food.id) is food and
+                food.generation == generation)
 
     def get_eaten_food(self, snake_head):
         """Список съеденной еды."""
+        x, y = snake_head.xy
+        distance = snake_head.radius + self.max_food_radius
         return [
-            food for food in self.objects.values()
+            food for _, _, food in self.grid.iter_rect(
+                x - distance, y - distance, x + distance, y + distance)
             if abs(food.x - snake_head.x) <= snake_head.radius + food.radius and
                abs(food.y - snake_head.y) <= snake_head.radius + food.radius and
                food.get_distance_to_circle(snake_head) < (
@@ -76,8 +138,18 @@ class FoodContainer(ObjectsContainer):
         """Поиск ближайшей еды по параметрами."""
         if not self.objects:
             return None
+        # Коэффициент не меньше расстояния до еды, поэтому поиск по сетке
+        # можно остановить, когда оставшаяся еда дальше лучшего значения
         key_func = partial(self._get_food_priority_coef, point, current_angle)
-        return min(self.objects.values(), key=key_func)
+        return self.grid.find_min(*point, key=key_func)
+
+    def get_food_in_radius(self, point, radius):
+        """Еда на расстоянии не больше radius от точки."""
+        return self.grid.query_radius(*point, radius)
+
+    def get_k_nearest_food(self, point, count):
+        """Список из count ближайших к точке единиц еды."""
+        return self.grid.k_nearest(*point, count)
 
     def get_next_food(self):
         """Возвращение первой попавшейся еды."""
@@ -97,112 +169,177 @@ class BotSnake(BaseSnake):
     default_color = (64, 255, 108)
     default_start_pos = (100, 100)
     # Определение времени до смены еды, если еда не была сьедена за это время
+    # (отсчитывается в тактах игры)
     food_delta_seconds = 1
     # Рисовать линию до еды и линию для избегания других змей
     draw_food_path = DRAW_FOOD_PATH
     draw_collision_avoiding_lines = DRAW_COLLISION_AVOIDING_LINES
-
-    def __init__(self, snake_id, win, food_container, **kwargs):
-        kwargs.setdefault('start_pos', get_random_pos())
-        super().__init__(snake_id, win, **kwargs)
+    # Углы (относительно направления движения) и дистанция до точек,
+    # проверяемых для избегания столкновений
+    probe_angles = (0, -45, -90, 45, 90)
+    probe_distance = 50
+    # Поворот при препятствии сбоку
+    avoid_turning_angle = 45
+
+    def __init__(self, snake_id, food_container, game_rect=GameRect,
+                 rng=random, scheduler=None, targeting=None, policy=None,
+                 **kwargs):
+        """
+        :param scheduler: Планировщик сроков по тактам игры (TickScheduler);
+            без него выбранная еда не портится
+        :param targeting: Выбор еды с повторным использованием кандидатов
+            (FoodTargeting); без него еда ищется по всей сетке
+        :param policy: Политика управления ботом (BotPolicy), по умолчанию -
+            политика игры
+        """
+        if 'start_pos' not in kwargs:
+            kwargs['start_pos'] = get_random_pos(game_rect=game_rect, rng=rng)
+        super().__init__(snake_id, **kwargs)
+        self.game_rect = game_rect
         self.current_food = None
+        # Поколение выбранной еды (еда берется из пула повторно)
+        self.current_food_generation = None
         self.food_container = food_container
         self.angle_different = 0
+        # Точки, проверенные при избегании столкновений (для отрисовки)
+        self.avoiding_points = []
 
-        self.food_datetime = None
+        self.scheduler = scheduler
+        self.targeting = targeting
+        self.policy = policy
+        # Флаг устанавливается игрой, когда наступает срок смены еды
+        self.food_expired = True
 
-    def go_to_point(self, pos_x, pos_y):
-        """Расчёт для перемещения в заданную точку."""
+    def get_turn_to_point(self, pos_x, pos_y):
+        """Угол поворота для перемещения в заданную точку."""
         angle_diff = calculate_angle_to_point(
             *self.head_xy, pos_x, pos_y, self.angle)
-
-        self.set_turning(DE.RIGHT if angle_diff >= 0 else DE.LEFT)
-        turning_angle = (
-            self.turning_angle if abs(angle_diff) > self.max_turning_angle
-            else angle_diff
-        )
-        self.change_angle(turning_angle)
+        if abs(angle_diff) > self.max_turning_angle:
+            return (self.max_turning_angle if angle_diff >= 0
+                    else -self.max_turning_angle)
+        return angle_diff
+
+    def apply_action(self, turn=None, boost=None):
+        """Применение действия политики (см. BotPolicy)."""
+        if boost is not None:
+            self.set_boost(boost)
+        self.update_current_speed()
+        if turn is not None:
+            self.change_angle(turn)
 
     def is_food_expired(self):
         """Проверяет, испортилась ли еда"""
-        return (
-            not self.food_datetime or
-            not datetime.datetime.now() - self.food_datetime <=
-                datetime.timedelta(seconds=self.food_delta_seconds)
-        )
+        return self.food_expired
 
     def has_to_find_food(self, food_count):
         """Проверяет необходимости выбора другой еды."""
         return (
             food_count or
             not self.current_food or
-            not self.food_container.has_object(self.current_food.id) or
+            not self.food_container.is_actual(
+                self.current_food, self.current_food_generation) or
             self.is_food_expired()
         )
 
     def find_new_food(self):
         """Нахождение новой еды."""
-        self.current_food = self.food_container.get_nearest_food(
-            self.head_xy, self.angle)
-        self.food_datetime = datetime.datetime.now()
-
-    def draw_food_line(self):
+        if self.targeting is not None:
+            self.current_food = self.targeting.get_target(self)
+        else:
+            self.current_food = self.food_container.get_nearest_food(
+                self.head_xy, self.angle)
+        if self.current_food:
+            self.current_food_generation = self.current_food.generation
+        self.food_expired = False
+        if self.scheduler is not None:
+            # Еда портится, если прошло больше food_delta_seconds
+            self.scheduler.schedule(
+                self.id, int(self.food_delta_seconds * TICK_RATE) + 1)
+
+    def draw_food_line(self, win, offset=(0, 0)):
         """Рисование линии до еды"""
         if self.current_food and self.draw_food_path:
-            self.draw_line_from_head(self.current_food.xy, PURPLE)
-
-    def avoid_collision(self, is_collide_snakes_rectangles):
-        """Избегание выхода за карту и избегание других змей."""
-        normal_angles = set()
-        for delta in (0, -45, -90, 45, 90):
-            new_pos = self.get_new_position_from_head(self.angle + delta, 50)
-            is_normal = (
-                not is_collide_snakes_rectangles(new_pos, exclude_snake=self)
-                and GameRect.collidepoint(*new_pos)
-            )
-            if is_normal:
-                normal_angles.add(delta)
-            if self.draw_collision_avoiding_lines:
-                color = GREEN if is_normal else RED
-                self.draw_line_from_head(new_pos, color)
+            self.draw_line_from_head(
+                win, self.current_food.xy, PURPLE, offset)
+
+    def get_overlays_rect(self):
+        points = [pos for pos, _ in self.avoiding_points]
+        if self.current_food and self.draw_food_path:
+            points.append(self.current_food.xy)
+        rects = [rect for rect in (super().get_overlays_rect(),
+                                   self.get_lines_rect(points)) if rect]
+        return rects[0].unionall(rects[1:]) if rects else None
+
+    def draw_overlays(self, win, offset=(0, 0)):
+        super().draw_overlays(win, offset)
+        self.draw_food_line(win, offset)
+        for pos, is_normal in self.avoiding_points:
+            self.draw_line_from_head(
+                win, pos, GREEN if is_normal else RED, offset)
+
+    def get_probes(self):
+        """Точки для проверки препятствий: список (угол, позиция)."""
+        return [
+            (delta, self.get_new_position_from_head(
+                self.angle + delta, self.probe_distance))
+            for delta in self.probe_angles
+        ]
+
+    def get_obstacles_turn(self, probes, normal_angles):
+        """Угол поворота в сторону от препятствий.
+
+        :param probes: Проверенные точки (угол, позиция)
+        :param normal_angles: Углы точек без препятствий
+        :return: Угол или None, если поворачивать не нужно
+        """
+        if self.draw_collision_avoiding_lines:
+            self.avoiding_points = [
+                (pos, delta in normal_angles) for delta, pos in probes]
 
         # Обработка ситуаций, когда сбоку препятствие
-        for angle_set, new_angle in (({-45, -90}, 45), ({45, 90}, -45)):
+        left_angles = {delta for delta in self.probe_angles if delta < 0}
+        right_angles = {delta for delta in self.probe_angles if delta > 0}
+        for angle_set, new_angle in (
+                (left_angles, self.avoid_turning_angle),
+                (right_angles, -self.avoid_turning_angle)):
             if not angle_set.issubset(normal_angles):
-                self.change_angle(new_angle)
-                return True
+                return new_angle
 
         # Проверка возможности пройти вперед, если нет - поворачиваем
         if 0 in normal_angles:
-            return False
-        else:
-            self.change_angle(normal_angles.pop() if normal_angles else 180)
-            return True
-
-    def update(self, food_count, is_collide_snakes_rectangles, **kwargs):
-        collision_is_avoided = self.avoid_collision(
-            is_collide_snakes_rectangles)
-        if not collision_is_avoided:
-            if self.has_to_find_food(food_count):
-                self.find_new_food()
-            if self.current_food:
-                self.go_to_point(*self.current_food.xy)
-        self.draw_food_line()
-        self.move()
-        if food_count:
-            self.add_tail(food_count)
+            return None
+        return normal_angles.pop() if normal_angles else 180
+
+    def get_food_turn(self, food_count):
+        """Угол поворота к еде (с выбором новой еды при необходимости) или
+        None, если еды нет."""
+        if self.has_to_find_food(food_count):
+            self.find_new_food()
+        if self.current_food:
+            return self.get_turn_to_point(*self.current_food.xy)
+        return None
 
 
 class SnakeContainer(ObjectsContainer):
     """Контейнер для змей."""
     obj_class = Food
 
-    def __init__(self, snake_color, food_container, win, count=0):
-        super().__init__(win, count)
+    def __init__(self, snake_color, food_container, count=0,
+                 game_rect=GameRect, rng=random, scheduler=None,
+                 targeting=None):
+        super().__init__(count)
         self.snake_color = snake_color
         self.food_container = food_container
+        self.game_rect = game_rect
+        self.rng = rng
+        self.scheduler = scheduler
+        self.targeting = targeting
         self.main_snake_id = None
-        self._snakes_rectangles = None
+        # Прямоугольники змей на текущий такт: id змеи -> (змея, прямоугольники)
+        self._snakes_rectangles = {}
+        # Количество обращений к кэшу прямоугольников с попаданием и промахом
+        self.rectangles_cache_hits = 0
+        self.rectangles_cache_misses = 0
 
     @property
     def main_snake(self):
@@ -226,33 +363,55 @@ class SnakeContainer(ObjectsContainer):
 
     def create_bot_snake(self, **kwargs):
         """Создание змеи - бота"""
-        bot = BotSnake(self.get_id(), self.win, self.food_container, **kwargs)
+        bot = BotSnake(self.get_id(), self.food_container,
+                       game_rect=self.game_rect, rng=self.rng,
+                       scheduler=self.scheduler, targeting=self.targeting,
+                       **kwargs)
         self.add_obj(bot)
         return bot.id
 
     def create_main_snake(self, **snake_params):
         """Создание змеи игрока"""
-        snake_params['color'] = self.snake_color
-        snake = Snake(self.get_id(), self.win, **snake_params)
-        self.add_obj(snake)
+        snake = self.create_player_snake(color=self.snake_color, **snake_params)
         self.main_snake_id = snake.id
         return snake
 
+    def create_player_snake(self, **snake_params):
+        """Создание змеи, управляемой игроком (в том числе по сети)."""
+        snake = Snake(self.get_id(), **snake_params)
+        self.add_obj(snake)
+        return snake
+
     def snake_is_dead(self, snake):
         """Смерть змеи."""
         snake.is_alive = False
         self.delete_by_id(snake.id)
+        self.invalidate_snake_rectangles(snake)
 
     def clear_snakes_rectangles(self):
         """Застаявляем при следующем обращении пересчитывать прямоугольники."""
-        self._snakes_rectangles = None
+        self._snakes_rectangles.clear()
+
+    def invalidate_snake_rectangles(self, snake):
+        """Пересчитать прямоугольники змеи при следующем обращении."""
+        self._snakes_rectangles.pop(snake.id, None)
+
+    def get_snake_rectangles(self, snake):
+        """Получение прямоугольников змеи из кэша (с построением при
+        промахе)."""
+        cached = self._snakes_rectangles.get(snake.id)
+        if cached is not None and cached[0] is snake:
+            self.rectangles_cache_hits += 1
+            return cached[1]
+        self.rectangles_cache_misses += 1
+        rectangles = snake.get_collision_rectangles()
+        self._snakes_rectangles[snake.id] = (snake, rectangles)
+        return rectangles
 
     @property
     def snakes_rectangles(self):
         """Получение прямоугольников для змей."""
-        if self._snakes_rectangles is not None:
-            return self._snakes_rectangles
-        return [(snake, snake.get_collision_rectangles())
+        return [(snake, self.get_snake_rectangles(snake))
                 for snake in self.get_snake_generator()]
 
     def is_collide_snakes_rectangles(self, pos, exclude_snake=None):
@@ -264,20 +423,84 @@ class SnakeContainer(ObjectsContainer):
         )
 
 
-class GameLogic:
-    """Класс с игровой логикой."""
+# Состояние змеи после очередного такта игры
+SnakeState = namedtuple(
+    'SnakeState', ['id', 'head', 'angle', 'length', 'radius', 'is_alive'])
+# Состояние игры после очередного такта
+GameState = namedtuple('GameState', ['tick', 'snakes', 'food_count'])
+# Запись о гибели змеи
+SnakeDeath = namedtuple(
+    'SnakeDeath', ['id', 'birth_tick', 'tick', 'cause', 'length'])
 
-    def __init__(self, win, snake_color=None):
-        self.win = win
+
+class GameLogic:
+    """Класс с игровой логикой.
+
+    Не зависит от отрисовки: игра продвигается вызовом step(), а отрисовка
+    (если нужна) подключается как наблюдатель через add_observer().
+    """
+    # Размер ячейки сетки для поиска столкновений змей
+    collision_grid_cell_size = 2 * BaseSnake.max_radius
+
+    # Этапы такта для профилирования: имя этапа -> имя метода
+    profiled_phases = {
+        'boundaries': 'check_snakes_in_game_rect',
+        'collisions': 'check_collisions',
+        'food': 'update_food',
+        'ai': 'update_directions',
+        'movement': 'update_positions',
+    }
+
+    def __init__(self, snake_color=None, with_player=True, bots_count=None,
+                 food_count=INITIAL_FOOD_COUNT, width=WIDTH, height=HEIGHT,
+                 seed=None):
+        """
+        :param with_player: Создавать ли змею игрока
+        :param bots_count: Количество ботов (по умолчанию 4 бота
+            на диагонали поля, иначе - в случайных свободных местах)
+        :param food_count: Начальное количество еды
+        :param width: Ширина игрового поля
+        :param height: Высота игрового поля
+        :param seed: Зерно генератора случайных чисел игры (по умолчанию -
+            случайное)
+        """
+        # Параметры, по которым игру можно создать заново
+        self.params = dict(
+            with_player=with_player, bots_count=bots_count,
+            food_count=food_count, width=width, height=height,
+        )
+        # Игра полностью определяется параметрами, зерном и вводом игрока
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        self.tick = 0
+        # Сроки ботов по тактам игры (часы игры - scheduler.tick)
+        self.scheduler = TickScheduler()
+        self.observers = []
+        self.input_observers = []
+        # Записи о гибели змей
+        self.deaths = []
+        self.game_rect = pygame.Rect(0, 0, width, height)
 
         self.bot_snakes = []
-        self.food_container = FoodContainer(self.win, count=INITIAL_FOOD_COUNT)
+        self.food_container = FoodContainer(
+            count=food_count, game_rect=self.game_rect, rng=self.rng)
+        self.targeting = FoodTargeting(self.food_container)
         self.snake_container = SnakeContainer(
-            snake_color, self.food_container, self.win)
-        self.snake = self.snake_container.create_main_snake()
+            snake_color, self.food_container, game_rect=self.game_rect,
+            rng=self.rng, scheduler=self.scheduler, targeting=self.targeting)
+        self.bots_ai = BotsAI(self.snake_container)
+        self.snake = (
+            self.snake_container.create_main_snake(
+                start_pos=self.game_rect.center)
+            if with_player else None
+        )
 
-        for one_pos in (100, 300, 500, 700):
-            self.snake_container.create_bot_snake(start_pos=(one_pos, one_pos))
+        if bots_count is None:
+            for one_pos in (100, 300, 500, 700):
+                self.create_bot_snake(start_pos=(one_pos, one_pos))
+        else:
+            for _ in range(bots_count):
+                self.create_bot_snake()
 
     def get_snakes(self, only_bots=False, only_alive=True):
         """Получение списка змей."""
@@ -286,101 +509,259 @@ class GameLogic:
             if not only_alive or (only_alive and s.is_alive)
         ]
 
-    def snake_is_dead(self, snake):
-        """Отработка гибели змеи."""
+    def create_bot_snake(self, **kwargs):
+        """Создание бота (по умолчанию - в случайном свободном месте)."""
+        if 'start_pos' not in kwargs:
+            kwargs['start_pos'] = self.get_random_free_position()
+        return self.snake_container.create_bot_snake(
+            birth_tick=self.tick, **kwargs)
+
+    def snake_is_dead(self, snake, cause=None):
+        """Отработка гибели змеи.
+
+        :param cause: Причина гибели (DeathCauseEnum)
+        """
+        self.deaths.append(SnakeDeath(
+            snake.id, snake.birth_tick, self.tick, cause, snake.length))
         if snake is self.snake:
             raise GameOverException()
 
         self.snake_container.snake_is_dead(snake)
-        for circle in snake.circles:
-            self.food_container.add_new_obj(pos=circle.xy, force=True)
-        self.snake_container.create_bot_snake(
-            start_pos=self.get_random_free_position())
+        self.scheduler.cancel(snake.id)
+        self.targeting.forget(snake.id)
+        for pos in snake.points:
+            self.food_container.add_new_obj(pos=pos, force=True)
+        # Вместо погибших ботов появляются новые, игроки появляются заново
+        # сами (см. server.py)
+        if isinstance(snake, BotSnake):
+            self.create_bot_snake()
+
+    def add_player_snake(self, color=None):
+        """Добавление змеи игрока в случайном свободном месте."""
+        return self.snake_container.create_player_snake(
+            start_pos=self.get_random_free_position(), color=color,
+            birth_tick=self.tick)
 
     def get_random_free_position(self, check_distance_to_head=True):
         """Получение точки далеко от других змей и игрока"""
         is_normal_distance = True
         for i in range(10):
-            pos = get_random_pos(0.15)
+            pos = get_random_pos(0.15, self.game_rect, self.rng)
             is_in_rect = self.snake_container.is_collide_snakes_rectangles(pos)
-            if check_distance_to_head:
+            if check_distance_to_head and self.snake:
                 is_normal_distance = (
                     not check_distance_to_head or check_distance_to_head and
                     get_points_distance(*pos, *self.snake.head_xy) > (
-                        self.snake.current_speed * FPS * 3)
+                        self.snake.current_speed * TICK_RATE * 3)
                 )
             if not is_in_rect and is_normal_distance:
                 return pos
-        return random.choice((0, WIDTH)), random.randint(0, HEIGHT)
+        return (self.rng.choice((0, self.game_rect.width)),
+                self.rng.randint(0, self.game_rect.height))
+
+    def build_collision_grid(self, snakes):
+        """Построение сетки из элементов тел змей для поиска столкновений."""
+        grid = SpatialHashGrid(self.collision_grid_cell_size)
+        for number, snake in enumerate(snakes):
+            for i, (x, y) in enumerate(snake.points):
+                grid.insert((snake.id, i), x, y, (number, snake, i))
+        return grid
+
+    def find_collision(self, snake, grid, max_radius):
+        """Поиск столкновения головы змеи с другими живыми змеями.
+
+        Возвращает пару (змея, номер её элемента) для первой по порядку змеи,
+        в которую врезалась голова, или None.
+        """
+        x, y = snake.head_xy
+        distance = snake.radius + max_radius
+        # Номер змеи -> (змея, наименьший номер задетого элемента)
+        hits = {}
+        for px, py, (number, other_snake, i) in grid.iter_rect(
+                x - distance, y - distance, x + distance, y + distance):
+            if other_snake is snake or not other_snake.is_alive:
+                continue
+            if get_points_distance(x, y, px, py) < (
+                    snake.radius + other_snake.radius):
+                if number not in hits or i < hits[number][1]:
+                    hits[number] = (other_snake, i)
+        return hits[min(hits)] if hits else None
+
+    def resolve_collision(self, snake, other_snake, index):
+        """Гибель змеи после того, как её голова врезалась в другую змею."""
+        if index == 0:
+            # Погибает та змея, у которой меньше угол до другой головы,
+            # т.е. та змея, которая въехала
+            snake_angle = abs(calculate_angle_to_point(
+                *snake.head_xy, *other_snake.head_xy, snake.angle))
+            other_snake_angle = abs(calculate_angle_to_point(
+                *other_snake.head_xy, *snake.head_xy, other_snake.angle))
+            self.snake_is_dead(
+                snake if snake_angle <= other_snake_angle else other_snake,
+                DeathCauseEnum.HEAD_ON)
+        else:
+            self.snake_is_dead(snake, DeathCauseEnum.BODY)
 
     def check_collisions(self):
-        """Проверка коллизий."""
-        snakes_was_updated = False
-
-        for snake in self.get_snakes():
-            for other_snake in self.get_snakes():
-                collision = snake.find_collision_with_other_snake(
-                    other_snake, exclude_self=True)
-                if collision is None:
+        """Проверка коллизий.
+
+        Головы проверяются только против ближайших элементов других змей из
+        сетки. Если кто-то погиб, сетка строится заново (с учетом новых змей)
+        и проверка повторяется, пока не останется столкновений.
+        """
+        snakes_was_updated = True
+        while snakes_was_updated:
+            snakes_was_updated = False
+            snakes = self.get_snakes()
+            if not snakes:
+                return
+            grid = self.build_collision_grid(snakes)
+            max_radius = max(snake.radius for snake in snakes)
+            for snake in snakes:
+                if not snake.is_alive:
                     continue
-                elif collision == 0:
-                    # Погибает та змея, у которой меньше угол до другой головы,
-                    # т.е. та змея, которая въехала
-                    snake_angle = abs(calculate_angle_to_point(
-                        *snake.head_xy, *other_snake.head_xy, snake.angle))
-                    other_snake_angle = abs(calculate_angle_to_point(
-                        *other_snake.head_xy, *snake.head_xy,
-                        other_snake.angle))
-                    self.snake_is_dead(snake if snake_angle <= other_snake_angle
-                                       else other_snake)
-                else:
-                    self.snake_is_dead(snake)
-                snakes_was_updated = True
-
-        if snakes_was_updated:
-            self.check_collisions()
+                collision = self.find_collision(snake, grid, max_radius)
+                if collision is not None:
+                    self.resolve_collision(snake, *collision)
+                    snakes_was_updated = True
 
     def check_snakes_in_game_rect(self):
-        """Проверка гибели змеи при выходе за границы игры."""
+        """Проверка гибели змеи при выходе за границы игры.
+
+        Все элементы лежат в игре, если в ней лежат крайние координаты
+        змеи. Как и в pygame.Rect.collidepoint, дробная часть координат
+        отбрасывается, а правая и нижняя границы в игру не входят.
+        """
+        rect = self.game_rect
+        left, right, top, bottom = rect.left, rect.right, rect.top, rect.bottom
         for snake in self.get_snakes():
-            if not all(GameRect.collidepoint(*circle.xy)
-                       for circle in snake.circles):
-                self.snake_is_dead(snake)
-
-    def set_snake_turning(self, direction):
-        """Установка направления поворота змеи."""
-        self.snake.set_turning(direction)
-
-    def set_snake_boost(self, enable_boost):
-        """Установка ускорения змеи."""
-        self.snake.set_boost(enable_boost)
+            box = snake.bounding_box
+            if not (left <= int(box.left) and int(box.right) < right and
+                    top <= int(box.top) and int(box.bottom) < bottom):
+                self.snake_is_dead(snake, DeathCauseEnum.BORDER)
+
+    def set_snake_turning(self, direction, snake=None):
+        """Установка направления поворота змеи (по умолчанию - игрока)."""
+        (snake or self.snake).set_turning(direction)
+
+    def set_snake_boost(self, enable_boost, snake=None):
+        """Установка ускорения змеи (по умолчанию - игрока)."""
+        (snake or self.snake).set_boost(enable_boost)
+
+    def add_observer(self, observer):
+        """Добавление наблюдателя, вызываемого после каждого такта игры."""
+        self.observers.append(observer)
+
+    def add_input_observer(self, observer):
+        """Добавление наблюдателя ввода: вызывается в начале каждого такта
+        с номером такта и вводом игрока (или None)."""
+        self.input_observers.append(observer)
+
+    def apply_inputs(self, inputs, snake=None):
+        """Применение ввода игрока (ключи turning и boost) к змее (по
+        умолчанию - к змее игрока)."""
+        if 'turning' in inputs:
+            self.set_snake_turning(inputs['turning'], snake)
+        if 'boost' in inputs:
+            self.set_snake_boost(inputs['boost'], snake)
+
+    def get_state(self):
+        """Получение состояния игры."""
+        return GameState(
+            self.tick,
+            tuple(
+                SnakeState(s.id, s.head_xy, s.angle, s.length,
+                           s.radius, s.is_alive)
+                for s in self.get_snakes()
+            ),
+            len(self.food_container.objects),
+        )
 
-    def draw(self):
-        """Отрисовка всего."""
-        self.food_container.draw()
-        for snake in self.get_snakes():
-            snake.draw()
+    def step(self, inputs=None):
+        """Один такт игры: применение ввода, обновление и оповещение."""
+        for observer in self.input_observers:
+            observer(self.tick, inputs)
+        if inputs:
+            self.apply_inputs(inputs)
+        self.update()
+        self.tick += 1
+        self.scheduler.tick = self.tick
+        for observer in self.observers:
+            observer(self)
+        return self.get_state()
+
+    def update_food(self, snakes):
+        """Поедание еды. Возвращает количество съеденной змеями еды."""
+        return [self.food_container.update(snake.head) for snake in snakes]
+
+    def handle_deadlines(self):
+        """Отметка ботов, у которых наступил срок смены еды."""
+        bots = self.snake_container.objects
+        for bot_id in self.scheduler.pop_due(self.tick):
+            bot = bots.get(bot_id)
+            if bot is not None:
+                bot.food_expired = True
+
+    def update_directions(self, snakes, foods_counts):
+        """Выбор направления движения змей (для ботов - одним пакетом)."""
+        bots, bots_foods_counts = [], []
+        for snake, food_count in zip(snakes, foods_counts):
+            if isinstance(snake, BotSnake):
+                bots.append(snake)
+                bots_foods_counts.append(food_count)
+            else:
+                snake.update_direction(food_count=food_count)
+        self.update_bots(bots, bots_foods_counts)
+
+    def get_bot_policy(self, bot):
+        """Политика бота (по умолчанию - BotsAI)."""
+        return bot.policy or self.bots_ai
+
+    def get_bots_observations(self):
+        """Наблюдения ботов на текущем такте (BotsObservations)."""
+        return BotsObservations(self.game_rect, self.bots_ai.build_rects_grid)
+
+    def update_bots(self, bots, foods_counts):
+        """Выбор и применение действий ботов.
+
+        Каждая политика вызывается один раз за такт со всеми своими ботами,
+        действия применяются после того, как их выбрали все политики.
+        """
+        if not bots:
+            return
+        # Политика -> (боты, количество съеденной ими еды)
+        groups = {}
+        for bot, food_count in zip(bots, foods_counts):
+            group = groups.setdefault(self.get_bot_policy(bot), ([], []))
+            group[0].append(bot)
+            group[1].append(food_count)
+        observations = self.get_bots_observations()
+        actions = []
+        for policy, (policy_bots, policy_foods_counts) in groups.items():
+            actions.extend(zip(policy_bots, policy.get_actions(
+                policy_bots, policy_foods_counts, observations)))
+        for bot, (turn, boost) in actions:
+            bot.apply_action(turn, boost)
+
+    def update_positions(self, snakes, foods_counts):
+        """Движение и рост змей."""
+        for snake, food_count in zip(snakes, foods_counts):
+            snake.update_position(food_count)
 
     def update(self, **kwargs):
-        self.snake_container.clear_snakes_rectangles()
         self.check_snakes_in_game_rect()
         self.check_collisions()
-        for snake in self.get_snakes():
-            snake_food_count = self.food_container.update(snake.head)
-            snake.update(
-                food_count=snake_food_count,
-                is_collide_snakes_rectangles=(
-                    self.snake_container.is_collide_snakes_rectangles),
-            )
-        self.draw()
-
-    @property
-    def game_surface_offset(self):
-        """Смещение игровой площадки."""
-        return (
-            WINDOW_WIDTH // 2 - self.snake.head.x,
-            WINDOW_HEIGHT // 2 - self.snake.head.y
-        )
+        snakes = self.get_snakes()
+        foods_counts = self.update_food(snakes)
+        self.handle_deadlines()
+        # Направления выбираются до движения змей, поэтому прямоугольники
+        # змей строятся один раз за такт
+        self.update_directions(snakes, foods_counts)
+        self.update_positions(snakes, foods_counts)
+        # Прямоугольники змей действительны до следующего движения: их можно
+        # получить между тактами (например, для наблюдений в env.py), и они
+        # не будут построены заново в начале следующего такта
+        self.snake_container.clear_snakes_rectangles()
 
 
 class Controller(BaseController):
@@ -388,42 +769,195 @@ class Controller(BaseController):
 
     default_color = GAME_DEFAULT_COLOR
     background_color = GAME_BACKGROUND_COLOR
-
-    def __init__(self, win, **kwargs):
+    # Этапы кадра для профилирования: имя этапа -> имя метода
+    profiled_phases = {
+        'events': 'check_events',
+        'tick': 'step',
+        'render': 'render',
+        'blit': 'blit_game_surface',
+        'blit_dirty': 'blit_game_rects',
+        'mini_map': 'draw_mini_map',
+    }
+
+    def __init__(self, win, profiling=PROFILING, dirty_rects=DIRTY_RECTS,
+                 **kwargs):
+        """
+        :param dirty_rects: Выводить в окно только изменившиеся области
+        """
         super().__init__(win)
-        self.game = GameLogic(self.game_surface, **kwargs)
+        self.game = GameLogic(**kwargs)
+        self.game_surface = TiledSurface(self.game.game_rect.size)
+        self.renderer = GameRenderer(
+            self.game_surface, self.background_color,
+            track_changes=dirty_rects)
+        self.game.add_observer(self.renderer)
+        self.game.food_container.listeners.append(
+            self.renderer.mark_food_dirty)
+        self.dirty_rects_enabled = dirty_rects
+        # Области окна, изменившиеся в последнем кадре (None - все окно)
+        self.dirty_rects = None
+        self.last_offset = None
+        # Область окна с замерами в последнем кадре
+        self.overlay_rect = None
+        self.mini_map_renderer = MiniMapRenderer(
+            MINI_MAP_SIZE, self.background_color)
+        # Ввод игрока, накопленный до следующего такта
+        self.inputs = {}
+        self.profiler = None
+        self.profiler_overlay = None
+        if profiling:
+            self.enable_profiling()
+
+    def enable_profiling(self):
+        """Включение замеров этапов кадра, такта и поведения ботов."""
+        if self.profiler:
+            return
+        self.profiler = PhaseProfiler(window=PROFILER_WINDOW)
+        self.profiler.attach(self, self.profiled_phases)
+        self.profiler.attach(self.game, GameLogic.profiled_phases)
+        self.profiler.attach(self.renderer, {'draw': 'draw'})
+        self.profiler.attach(self.game.bots_ai, {
+            'ai_rects_grid': 'build_rects_grid',
+            'ai_probes': 'check_probes',
+        })
+        self.profiler_overlay = ProfilerOverlay(self.profiler)
+
+    def disable_profiling(self):
+        """Отключение замеров."""
+        if self.profiler:
+            self.profiler.detach()
+        self.profiler = self.profiler_overlay = None
+
+    def dump_profile(self, path=PROFILER_DUMP_PATH):
+        """Сохранение замеров в файл (если профилирование включено)."""
+        if self.profiler and path:
+            self.profiler.dump(path)
 
     def handle_event(self, event):
         # Проверка зажатия клавиши
         if event.type == pygame.KEYDOWN:
-            if event.key in LEFT_RIGHT_BUTTONS:
-                self.game.set_snake_turning(DE.get_from_button(event.key))
+            if event.key == pygame.K_F3 and self.profiler_overlay:
+                self.profiler_overlay.is_visible = (
+                    not self.profiler_overlay.is_visible)
+            elif event.key in LEFT_RIGHT_BUTTONS:
+                self.inputs['turning'] = DE.get_from_button(event.key)
             elif event.key == pygame.K_UP:
-                self.game.set_snake_boost(True)
+                self.inputs['boost'] = True
         # Проверка отжатия клавиши
         elif event.type == pygame.KEYUP:
             if event.key in LEFT_RIGHT_BUTTONS:
-                self.game.set_snake_turning(None)
+                self.inputs['turning'] = None
             elif event.key == pygame.K_UP:
-                self.game.set_snake_boost(False)
-
-    def draw_mini_map(self, size):
-        """Отрисовка мини карты."""
-        mini_map = pygame.transform.scale(self.game_surface, (size, size))
-        self.win.blit(mini_map, (0, WINDOW_HEIGHT - size))
-        pygame.draw.rect(
-            self.win, BLACK,
-            pygame.Rect(0, WINDOW_HEIGHT - size, size, size), 1
-        )
+                self.inputs['boost'] = False
 
-    def update(self):
-        super().update()
-        self.game.update()
+    def draw_mini_map(self, size, force=True):
+        """Отрисовка мини карты.
+
+        :param force: Выводить карту, даже если она не перерисовывалась
+        :return: Область окна с картой (None, если карта не выводилась)
+        """
+        mini_map = self.mini_map_renderer.get_surface(self.game)
+        if not force and not self.mini_map_renderer.is_changed:
+            return None
+        rect = pygame.Rect(0, WINDOW_HEIGHT - size, size, size)
+        self.win.blit(mini_map, rect)
+        pygame.draw.rect(self.win, BLACK, rect, 1)
+        return rect
+
+    def step(self):
+        # Ввод применяется в начале такта, чтобы игру можно было повторить
+        inputs, self.inputs = self.inputs, {}
+        self.game.step(inputs)
+
+    def get_camera_offset(self, alpha=1):
+        """Смещение игрового поля в окне.
+
+        Обычно камера следует за головой змеи игрока. При выводе только
+        изменившихся областей камера стоит на месте, пока голова внутри
+        CAMERA_DEAD_ZONE в центре окна, а затем снова центрируется на ней.
+        """
+        offset = self.renderer.get_offset(self.game, alpha)
+        if not self.dirty_rects_enabled or self.last_offset is None:
+            return offset
+        # Сдвиг головы от центра окна при прежнем положении камеры
+        dx = self.last_offset[0] - offset[0]
+        dy = self.last_offset[1] - offset[1]
+        zone_width, zone_height = CAMERA_DEAD_ZONE
+        if abs(dx) <= zone_width // 2 and abs(dy) <= zone_height // 2:
+            return self.last_offset
+        return offset
+
+    def render(self, alpha=1):
+        # Рисуем и выводим только плитки видимой части игрового поля
+        offset_x, offset_y = self.get_camera_offset(alpha)
+        viewport = pygame.Rect(
+            -offset_x, -offset_y, WINDOW_WIDTH, WINDOW_HEIGHT
+        ).clip(self.game_surface.get_rect())
+        redrawn_rects = self.renderer.draw(self.game, alpha, viewport)
+
+        # Если камера не сдвинулась, выводим только перерисованные плитки
+        offset = (offset_x, offset_y)
+        if self.dirty_rects_enabled and offset == self.last_offset:
+            dirty_rects = self.blit_game_rects(redrawn_rects, offset)
+            if self.overlay_rect:
+                # Полупрозрачные замеры рисуются поверх восстановленного поля
+                self.restore_window_rect(self.overlay_rect, offset)
+                dirty_rects.append(self.overlay_rect)
+        else:
+            self.blit_game_surface(viewport, offset)
+            dirty_rects = None
+        self.last_offset = offset
 
-        self.win.fill(self.default_color)
-        self.win.blit(self.game_surface, self.game.game_surface_offset)
         if SHOW_MINI_MAP:
-            self.draw_mini_map(MINI_MAP_SIZE)
+            # Карту выводим заново, если её задели выведенные плитки
+            mini_map_rect = self.draw_mini_map(
+                MINI_MAP_SIZE, force=dirty_rects is None or bool(
+                    pygame.Rect(0, WINDOW_HEIGHT - MINI_MAP_SIZE,
+                                MINI_MAP_SIZE, MINI_MAP_SIZE
+                                ).collidelistall(dirty_rects)))
+            if dirty_rects is not None and mini_map_rect:
+                dirty_rects.append(mini_map_rect)
+        self.overlay_rect = (
+            self.profiler_overlay.draw(self.win) if self.profiler_overlay
+            else None)
+        if dirty_rects is not None and self.overlay_rect:
+            dirty_rects.append(self.overlay_rect)
+        self.dirty_rects = dirty_rects
+
+    def update_display(self):
+        """Вывод кадра на экран (только изменившихся областей, если они
+        известны)."""
+        if self.dirty_rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.dirty_rects)
+
+    def blit_game_surface(self, viewport, offset):
+        """Вывод видимой части игрового поля в окно."""
+        self.win.fill(self.default_color)
+        self.game_surface.blit_to(self.win, viewport, offset)
+
+    def restore_window_rect(self, rect, offset):
+        """Вывод в область окна rect игрового поля под ней."""
+        self.win.set_clip(rect)
+        self.win.fill(self.default_color)
+        self.game_surface.blit_to(
+            self.win, rect.move(-offset[0], -offset[1]), offset)
+        self.win.set_clip(None)
+
+    def blit_game_rects(self, rects, offset):
+        """Вывод в окно перерисованных областей игрового поля.
+
+        :return: Список изменившихся областей окна
+        """
+        window_rect = self.win.get_rect()
+        dirty_rects = []
+        for rect in rects:
+            self.game_surface.blit_to(self.win, rect, offset)
+            window_area = rect.move(offset).clip(window_rect)
+            if window_area.width and window_area.height:
+                dirty_rects.append(window_area)
+        return dirty_rects
 
 
 class TestController(BaseController):
@@ -0,0 +1,94 @@
+import time
+
+from settings import *
+
+
+class FixedTimestepLoop:
+    """Цикл с фиксированным шагом симуляции.
+
+    Время, прошедшее между кадрами, накапливается и расходуется тактами
+    длиной 1 / tick_rate секунды, поэтому скорость игры не зависит от частоты
+    кадров. Остаток неизрасходованного времени (alpha) используется для
+    интерполяции при отрисовке.
+    """
+
+    def __init__(self, tick_rate=TICK_RATE,
+                 max_catch_up_ticks=MAX_CATCH_UP_TICKS, uncapped=False,
+                 fps=FPS, timer=time.perf_counter):
+        """
+        :param tick_rate: Количество тактов в секунду
+        :param max_catch_up_ticks: Максимум тактов за кадр (при отставании
+            лишнее время отбрасывается, и игра замедляется)
+        :param uncapped: Выполнять такты подряд без учета времени, прерываясь
+            только на вывод кадров с частотой fps
+        :param fps: Частота кадров без ограничения тактов (0 - кадр после
+            каждого такта)
+        :param timer: Функция текущего времени в секундах
+        """
+        self.tick_duration = 1 / tick_rate
+        self.max_catch_up_ticks = max_catch_up_ticks
+        self.uncapped = uncapped
+        self.frame_duration = 1 / fps if fps else 0
+        self.timer = timer
+        self.accumulator = 0
+        self.last_time = None
+
+    @property
+    def alpha(self):
+        """Доля такта, прошедшая после последнего выполненного такта."""
+        if self.uncapped:
+            return 1
+        return self.accumulator / self.tick_duration
+
+    def advance(self, frame_time):
+        """Учет времени кадра. Возвращает количество тактов для выполнения."""
+        self.accumulator += frame_time
+        ticks = int(self.accumulator // self.tick_duration)
+        if ticks > self.max_catch_up_ticks:
+            ticks = self.max_catch_up_ticks
+            # Отставание сверх лимита не догоняем
+            self.accumulator = self.accumulator % self.tick_duration
+        else:
+            self.accumulator -= ticks * self.tick_duration
+        return ticks
+
+    def tick(self):
+        """Учет времени с прошлого вызова. Возвращает количество тактов."""
+        now = self.timer()
+        frame_time = 0 if self.last_time is None else now - self.last_time
+        self.last_time = now
+        return self.advance(frame_time)
+
+    def run_ticks(self, step):
+        """Выполнение тактов кадра функцией step. Возвращает количество
+        выполненных тактов.
+
+        Обычно выполняются такты, накопившиеся с прошлого вызова, а без
+        ограничения - подряд, пока не придет время следующего кадра.
+        """
+        if not self.uncapped:
+            ticks = self.tick()
+            for _ in range(ticks):
+                step()
+            return ticks
+
+        deadline = self.timer() + self.frame_duration
+        ticks = 0
+        while True:
+            step()
+            ticks += 1
+            if self.timer() >= deadline:
+                return ticks
+
+
+def run_uncapped(game, max_ticks, inputs=None):
+    """Выполнение тактов игры подряд, без ожидания (для прогонов без окна).
+
+    :param inputs: Словарь {номер такта: ввод игрока}
+    :return: Состояние игры после последнего такта
+    """
+    inputs = inputs or {}
+    state = game.get_state()
+    while game.tick < max_ticks:
+        state = game.step(inputs.get(game.tick))
+    return state
@@ -0,0 +1,158 @@
+import csv
+import functools
+import json
+import time
+from collections import deque
+
+# Границы корзин гистограммы длительностей, в миллисекундах
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 66)
+
+
+def get_percentile(values, percent):
+    """Перцентиль (0-100) по списку значений."""
+    if not values:
+        return 0
+    values = sorted(values)
+    index = round(percent / 100 * (len(values) - 1))
+    return values[index]
+
+
+def get_histogram(values_ms, bounds=HISTOGRAM_BOUNDS_MS):
+    """Количество значений по корзинам: до каждой границы и выше последней."""
+    counts = [0] * (len(bounds) + 1)
+    for value in values_ms:
+        for i, bound in enumerate(bounds):
+            if value < bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    return counts
+
+
+class PhaseSamples:
+    """Замеры одного этапа: последние длительности и итоги за сессию."""
+    __slots__ = ('durations', 'calls', 'total')
+
+    def __init__(self, window=None):
+        self.durations = deque(maxlen=window)
+        self.calls = 0
+        self.total = 0
+
+    def add(self, duration):
+        self.durations.append(duration)
+        self.calls += 1
+        self.total += duration
+
+
+class PhaseProfiler:
+    """Замер времени этапов игры.
+
+    Методы этапов подменяются у конкретного объекта (или класса) обертками с
+    замером времени, поэтому без подключенного профилировщика накладных
+    расходов нет. Для статистики хранятся последние window замеров каждого
+    этапа (все замеры, если window не задан).
+    """
+
+    def __init__(self, window=None, timer=time.perf_counter):
+        self.window = window
+        self.timer = timer
+        # Этап -> замеры
+        self.phases = {}
+        # Подмененные методы: (объект, имя метода, исходный атрибут объекта)
+        self.attached = []
+
+    def get_phase_samples(self, phase):
+        """Замеры этапа (создаются при первом обращении)."""
+        if phase not in self.phases:
+            self.phases[phase] = PhaseSamples(self.window)
+        return self.phases[phase]
+
+    @property
+    def samples(self):
+        """Последние длительности по этапам, в секундах."""
+        return {phase: list(phase_samples.durations)
+                for phase, phase_samples in self.phases.items()}
+
+    def wrap(self, phase, func):
+        """Обертка функции с замером времени для этапа."""
+        add_sample = self.get_phase_samples(phase).add
+        timer = self.timer
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add_sample(timer() - start)
+        return timed
+
+    def attach(self, obj, phases):
+        """Подключение к объекту или классу.
+
+        :param phases: Словарь {имя этапа: имя метода}
+        """
+        for phase, method_name in phases.items():
+            original = vars(obj).get(method_name)
+            setattr(obj, method_name,
+                    self.wrap(phase, getattr(obj, method_name)))
+            self.attached.append((obj, method_name, original))
+
+    def detach(self):
+        """Отключение от всех объектов (возврат исходных методов)."""
+        for obj, method_name, original in reversed(self.attached):
+            if original is None:
+                delattr(obj, method_name)
+            else:
+                setattr(obj, method_name, original)
+        self.attached = []
+
+    def clear(self):
+        """Удаление собранных замеров."""
+        self.phases = {phase: PhaseSamples(self.window)
+                       for phase in self.phases}
+
+    def get_stats(self):
+        """Статистика по этапам в миллисекундах.
+
+        calls и total_ms - за всю сессию, остальное - по последним замерам.
+        """
+        stats = {}
+        for phase, phase_samples in self.phases.items():
+            if not phase_samples.calls:
+                continue
+            durations_ms = [d * 1000 for d in phase_samples.durations]
+            stats[phase] = {
+                'calls': phase_samples.calls,
+                'total_ms': phase_samples.total * 1000,
+                'mean_ms': sum(durations_ms) / len(durations_ms),
+                'p50_ms': get_percentile(durations_ms, 50),
+                'p99_ms': get_percentile(durations_ms, 99),
+                'max_ms': max(durations_ms),
+                'histogram': get_histogram(durations_ms),
+            }
+        return stats
+
+    def dump(self, path):
+        """Сохранение статистики в файл (CSV для .csv, иначе JSON)."""
+        stats = self.get_stats()
+        if not path.endswith('.csv'):
+            with open(path, 'w') as f:
+                json.dump({'histogram_bounds_ms': HISTOGRAM_BOUNDS_MS,
+                           'phases': stats}, f, indent=2)
+            return
+
+        histogram_columns = [f'lt_{bound}_ms' for bound in HISTOGRAM_BOUNDS_MS]
+        histogram_columns.append(f'ge_{HISTOGRAM_BOUNDS_MS[-1]}_ms')
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['phase', 'calls', 'total_ms', 'mean_ms', 'p50_ms',
+                             'p99_ms', 'max_ms', *histogram_columns])
+            for phase, phase_stats in stats.items():
+                writer.writerow([
+                    phase, phase_stats['calls'], phase_stats['total_ms'],
+                    phase_stats['mean_ms'], phase_stats['p50_ms'],
+                    phase_stats['p99_ms'], phase_stats['max_ms'],
+                    *phase_stats['histogram'],
+                ])
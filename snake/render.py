@@ -0,0 +1,545 @@
+from array import array
+from collections import OrderedDict
+
+import pygame
+
+from settings import *
+
+
+class SpriteCache:
+    """Кэш изображений кругов по цвету и радиусу.
+
+    pygame отбрасывает дробную часть радиуса и координат центра, поэтому
+    круг, выведенный из кэша, совпадает попиксельно с pygame.draw.circle.
+    Давно не использованные изображения вытесняются (LRU).
+    """
+    color_key = (255, 0, 255)
+
+    def __init__(self, max_size=SPRITE_CACHE_SIZE):
+        self.max_size = max_size
+        # (цвет, радиус) -> поверхность
+        self.sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_sprite(self, color, radius):
+        """Изображение круга (None, если круг не виден)."""
+        key = (tuple(color), int(radius))
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self.sprites.move_to_end(key)
+            return sprite
+        self.misses += 1
+        radius = key[1]
+        if radius < 1:
+            return None
+        color_key = self.color_key if key[0] != self.color_key else BLACK
+        sprite = pygame.Surface((2 * radius, 2 * radius))
+        sprite.fill(color_key)
+        pygame.draw.circle(sprite, color, (radius, radius), radius)
+        sprite.set_colorkey(color_key, pygame.RLEACCEL)
+        self.sprites[key] = sprite
+        if len(self.sprites) > self.max_size:
+            self.sprites.popitem(last=False)
+        return sprite
+
+    def draw_circle(self, win, color, center, radius, offset=(0, 0)):
+        """Вывод круга (аналог pygame.draw.circle со смещением offset)."""
+        sprite = self.get_sprite(color, radius)
+        if sprite is not None:
+            radius = int(radius)
+            win.blit(sprite, (int(center[0]) - radius + offset[0],
+                              int(center[1]) - radius + offset[1]))
+
+    def draw_circles(self, win, color, radius, centers, offset=(0, 0)):
+        """Вывод одинаковых кругов одним пакетом."""
+        sprite = self.get_sprite(color, radius)
+        if sprite is None:
+            return
+        radius = int(radius)
+        offset_x, offset_y = offset[0] - radius, offset[1] - radius
+        win.blits([
+            (sprite, (int(x) + offset_x, int(y) + offset_y))
+            for x, y in centers
+        ], False)
+
+    def draw_figures(self, win, figures, offset=(0, 0)):
+        """Вывод кругов (объектов с color, radius, x, y) по порядку: подряд
+        идущие одинаковые круги выводятся одним пакетом."""
+        key = None
+        centers = []
+        for figure in figures:
+            figure_key = (figure.color, figure.radius)
+            if figure_key != key:
+                if centers:
+                    self.draw_circles(win, *key, centers, offset)
+                key, centers = figure_key, []
+            centers.append((figure.x, figure.y))
+        if centers:
+            self.draw_circles(win, *key, centers, offset)
+
+
+sprite_cache = SpriteCache()
+
+
+class TiledSurface:
+    """Поверхность игрового поля из плиток.
+
+    Плитки создаются только при обращении к ним (для области просмотра), а
+    плитки вне области просмотра освобождаются, поэтому память и время
+    отрисовки кадра не зависят от размера поля.
+    """
+
+    def __init__(self, size, tile_size=TILE_SIZE):
+        self.width, self.height = size
+        self.tile_size = tile_size
+        # (номер столбца, номер строки) -> поверхность плитки
+        self.tiles = {}
+
+    def get_rect(self):
+        return pygame.Rect(0, 0, self.width, self.height)
+
+    def get_size(self):
+        return self.width, self.height
+
+    def get_tile_rect(self, key):
+        """Область поля, занимаемая плиткой."""
+        tile_size = self.tile_size
+        return pygame.Rect(key[0] * tile_size, key[1] * tile_size,
+                           tile_size, tile_size).clip(self.get_rect())
+
+    def get_tile_keys(self, rect=None):
+        """Плитки, пересекающие область поля (по умолчанию - все поле)."""
+        rect = self.get_rect() if rect is None else rect.clip(self.get_rect())
+        if not rect.width or not rect.height:
+            return []
+        tile_size = self.tile_size
+        return [
+            (tx, ty)
+            for ty in range(rect.top // tile_size,
+                            (rect.bottom - 1) // tile_size + 1)
+            for tx in range(rect.left // tile_size,
+                            (rect.right - 1) // tile_size + 1)
+        ]
+
+    def get_tile(self, key):
+        """Поверхность плитки (создается при первом обращении)."""
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.tiles[key] = pygame.Surface(
+                self.get_tile_rect(key).size)
+        return tile
+
+    def release_tiles(self, keep_keys):
+        """Освобождение плиток, кроме keep_keys."""
+        keep_keys = set(keep_keys)
+        for key in [key for key in self.tiles if key not in keep_keys]:
+            del self.tiles[key]
+
+    def fill(self, color, rect=None):
+        """Заливка созданных плиток (в области rect, если она задана)."""
+        for key, tile in self.tiles.items():
+            tile_rect = self.get_tile_rect(key)
+            area = tile_rect if rect is None else tile_rect.clip(rect)
+            if area.width and area.height:
+                tile.fill(color, area.move(-tile_rect.x, -tile_rect.y))
+
+    def blit_to(self, win, rect, offset=(0, 0)):
+        """Вывод плиток, пересекающих область rect, на поверхность win."""
+        offset_x, offset_y = offset
+        win.blits([
+            (self.get_tile(key),
+             (tile_rect.x + offset_x, tile_rect.y + offset_y))
+            for key, tile_rect in (
+                (key, self.get_tile_rect(key))
+                for key in self.get_tile_keys(rect))
+        ], False)
+
+
+class GameRenderer:
+    """Отрисовка игры на поверхности.
+
+    Подключается к GameLogic как наблюдатель: после каждого такта запоминает
+    координаты змей, чтобы при отрисовке кадра между тактами интерполировать
+    положение элементов. Рисуются только объекты, попадающие в область
+    просмотра. Поверхностью может быть pygame.Surface или TiledSurface:
+    тогда область просмотра рисуется по плиткам.
+
+    Если отслеживаются изменения (track_changes), плитки хранятся между
+    кадрами и перерисовываются, только если в них сдвинулись змеи или
+    изменилась еда (о ней сообщает FoodContainer через mark_food_dirty).
+    """
+
+    def __init__(self, surface, background_color=GAME_BACKGROUND_COLOR,
+                 track_changes=False):
+        self.surface = surface
+        self.background_color = background_color
+        self.track_changes = track_changes
+        # Плитки, изменившиеся с прошлого кадра, и нарисованные змеи:
+        # змея -> результат get_snake_tiles (id змей используются повторно,
+        # поэтому ключом служит сам объект)
+        self.dirty_tiles = set()
+        self.drawn_snakes = {}
+        # id змеи -> (змея, xs, ys) на предыдущем и на последнем такте
+        self.previous_points = {}
+        self.current_points = {}
+
+    def __call__(self, game):
+        self.previous_points = self.current_points
+        self.current_points = {
+            snake.id: (snake, array('d', snake.xs), array('d', snake.ys))
+            for snake in game.get_snakes()
+        }
+
+    def get_previous_points(self, snake):
+        """Координаты змеи на предыдущем такте (None для новой змеи, в том
+        числе получившей id погибшей)."""
+        previous = self.previous_points.get(snake.id)
+        if previous is None or previous[0] is not snake:
+            return None
+        return previous[1], previous[2]
+
+    def get_snake_points(self, snake, alpha=1):
+        """Координаты элементов змеи между предыдущим и последним тактом."""
+        previous = self.get_previous_points(snake)
+        if alpha >= 1 or previous is None:
+            return list(snake.points)
+        prev_xs, prev_ys = previous
+        points = [
+            (px + (x - px) * alpha, py + (y - py) * alpha)
+            for px, py, x, y in zip(prev_xs, prev_ys, snake.xs, snake.ys)
+        ]
+        # Новые элементы хвоста рисуем без интерполяции
+        points.extend(zip(snake.xs[len(points):], snake.ys[len(points):]))
+        return points
+
+    def get_head_xy(self, snake, alpha=1):
+        """Координаты головы змеи между предыдущим и последним тактом."""
+        previous = self.get_previous_points(snake)
+        if alpha >= 1 or previous is None:
+            return snake.head_xy
+        prev_x, prev_y = previous[0][0], previous[1][0]
+        head_x, head_y = snake.head_xy
+        return (prev_x + (head_x - prev_x) * alpha,
+                prev_y + (head_y - prev_y) * alpha)
+
+    def get_offset(self, game, alpha=1):
+        """Смещение игровой площадки, чтобы голова игрока была в центре.
+
+        Округляется до целых пикселей, чтобы плитки выводились без щелей.
+        """
+        head_x, head_y = self.get_head_xy(game.snake, alpha)
+        return (round(WINDOW_WIDTH // 2 - head_x),
+                round(WINDOW_HEIGHT // 2 - head_y))
+
+    def draw_food(self, game, area=None, offset=(0, 0), surface=None):
+        """Отрисовка еды, попадающей в область поля (со смещением
+        координат offset)."""
+        surface = self.surface if surface is None else surface
+        food_container = game.food_container
+        if area is None:
+            foods = food_container.objects.values()
+        else:
+            margin = food_container.max_food_radius + 1
+            foods = (food for _, _, food in food_container.grid.iter_rect(
+                area.left - margin, area.top - margin,
+                area.right + margin, area.bottom + margin))
+        sprite_cache.draw_figures(surface, foods, offset)
+
+    def get_visible_snakes(self, game, alpha=1, area=None):
+        """Змеи, попадающие в область поля: список пар (змея, координаты
+        элементов в области).
+
+        Змеи вне области отбрасываются по ограничивающему прямоугольнику до
+        интерполяции координат, поэтому затраты зависят от видимых змей, а
+        не от размера мира.
+        """
+        if area is None:
+            return [(snake, self.get_snake_points(snake, alpha))
+                    for snake in game.get_snakes()]
+        visible = []
+        for snake in game.get_snakes():
+            # Запас на радиус и на сдвиг при интерполяции
+            margin = snake.radius + snake.max_speed_with_boost
+            left, top = area.left - margin, area.top - margin
+            right, bottom = area.right + margin, area.bottom + margin
+            box = snake.get_bounding_box()
+            if (box.right < left or box.left > right or
+                    box.bottom < top or box.top > bottom):
+                continue
+            points = [(x, y) for x, y in self.get_snake_points(snake, alpha)
+                      if left <= x <= right and top <= y <= bottom]
+            visible.append((snake, points))
+        return visible
+
+    def get_tiles_points(self, points, margin):
+        """Раскладка точек по плиткам, которые задевают круги радиуса
+        margin."""
+        tile_size = self.surface.tile_size
+        tiles_points = {}
+        # Соседние элементы змеи обычно попадают в одну плитку
+        last_cell = last_points = None
+        for point in points:
+            x, y = point
+            left, right = int((x - margin) // tile_size), int(
+                (x + margin) // tile_size)
+            top, bottom = int((y - margin) // tile_size), int(
+                (y + margin) // tile_size)
+            if left == right and top == bottom:
+                if (left, top) != last_cell:
+                    last_cell = (left, top)
+                    last_points = tiles_points.setdefault(last_cell, [])
+                last_points.append(point)
+                continue
+            for tx in range(left, right + 1):
+                for ty in range(top, bottom + 1):
+                    tiles_points.setdefault((tx, ty), []).append(point)
+        return tiles_points
+
+    def get_retained_keys(self, viewport):
+        """Плитки, которые хранятся между кадрами: область просмотра с запасом
+        в одну плитку (при сдвиге камеры они только выводятся заново)."""
+        if not self.track_changes:
+            return self.surface.get_tile_keys(viewport)
+        tile_size = self.surface.tile_size
+        return self.surface.get_tile_keys(
+            viewport.inflate(2 * tile_size, 2 * tile_size))
+
+    def mark_food_dirty(self, food):
+        """Отметка плиток, которые задевает добавленная или удаленная еда."""
+        if not self.track_changes:
+            return
+        radius = food.radius + 1
+        self.dirty_tiles.update(self.surface.get_tile_keys(pygame.Rect(
+            int(food.x) - radius, int(food.y) - radius,
+            2 * radius + 1, 2 * radius + 1)))
+
+    def get_snake_tiles(self, snake, points):
+        """Раскладка змеи по плиткам: (плитка -> (радиус, точки), плитки
+        вспомогательных объектов, их область)."""
+        # Запас в 1 пиксель на округление координат при отрисовке
+        tiles_points = {
+            key: (snake.radius, points)
+            for key, points in self.get_tiles_points(
+                points, snake.radius + 1).items()
+        }
+        overlays_rect = snake.get_overlays_rect()
+        overlays_keys = (
+            set(self.surface.get_tile_keys(overlays_rect))
+            if overlays_rect else set())
+        return tiles_points, overlays_keys, overlays_rect
+
+    def get_dirty_tiles(self, snakes_tiles):
+        """Плитки, изменившиеся с прошлого кадра (из-за движения, появления
+        или гибели змей и изменения еды)."""
+        dirty = self.dirty_tiles
+        self.dirty_tiles = set()
+        previous = self.drawn_snakes
+        for snake, (tiles_points, overlays_keys, overlays_rect) in (
+                snakes_tiles.items()):
+            drawn = previous.pop(snake, None)
+            if drawn is None:
+                dirty.update(tiles_points, overlays_keys)
+                continue
+            drawn_points, drawn_overlays_keys, drawn_overlays_rect = drawn
+            dirty.update(
+                key for key in tiles_points.keys() | drawn_points.keys()
+                if tiles_points.get(key) != drawn_points.get(key)
+            )
+            if overlays_rect != drawn_overlays_rect:
+                dirty.update(overlays_keys, drawn_overlays_keys)
+        # Змеи, которых больше нет в области
+        for drawn_points, drawn_overlays_keys, _ in previous.values():
+            dirty.update(drawn_points, drawn_overlays_keys)
+        self.drawn_snakes = snakes_tiles
+        return dirty
+
+    def draw_tiles(self, game, alpha, viewport):
+        """Отрисовка плиток, пересекающих область просмотра.
+
+        Плитки рисуются целиком. Если отслеживаются изменения, то заново
+        рисуются только новые и изменившиеся плитки, иначе - все. Плитки вне
+        области хранения освобождаются.
+
+        :return: Области поля перерисованных плиток
+        """
+        tiles = self.surface
+        keys = tiles.get_tile_keys(viewport)
+        retained_keys = self.get_retained_keys(viewport)
+        if not retained_keys:
+            tiles.release_tiles(retained_keys)
+            return []
+        tiles_rect = tiles.get_tile_rect(retained_keys[0]).unionall(
+            [tiles.get_tile_rect(key) for key in retained_keys[1:]])
+        snakes = self.get_visible_snakes(game, alpha, tiles_rect)
+        snakes_tiles = {
+            snake: self.get_snake_tiles(snake, points)
+            for snake, points in snakes
+        }
+
+        if self.track_changes:
+            dirty = self.get_dirty_tiles(snakes_tiles)
+            # Изменившиеся плитки вне области просмотра не перерисовываем,
+            # а освобождаем
+            retained_keys = [
+                key for key in retained_keys
+                if key in keys or key not in dirty]
+            tiles.release_tiles(retained_keys)
+            draw_keys = [
+                key for key in keys if key in dirty or key not in tiles.tiles]
+        else:
+            tiles.release_tiles(keys)
+            draw_keys = keys
+
+        for key in draw_keys:
+            tile = tiles.get_tile(key)
+            tile_rect = tiles.get_tile_rect(key)
+            offset = (-tile_rect.x, -tile_rect.y)
+            tile.fill(self.background_color)
+            self.draw_food(game, tile_rect, offset, tile)
+            for snake, _ in snakes:
+                tiles_points, overlays_keys, _ = snakes_tiles[snake]
+                if key in tiles_points:
+                    snake.draw_body(tile, tiles_points[key][1], offset)
+                if key in overlays_keys:
+                    snake.draw_overlays(tile, offset)
+        return [tiles.get_tile_rect(key) for key in draw_keys]
+
+    def draw(self, game, alpha=1, viewport=None):
+        """Отрисовка фона, еды и змей (только в области просмотра, если она
+        задана).
+
+        :return: Список перерисованных областей поля
+        """
+        if isinstance(self.surface, TiledSurface):
+            return self.draw_tiles(
+                game, alpha, viewport or self.surface.get_rect())
+        self.surface.fill(self.background_color, viewport)
+        self.draw_food(game, viewport)
+        for snake, points in self.get_visible_snakes(game, alpha, viewport):
+            snake.draw(self.surface, points=points)
+        return [viewport or self.surface.get_rect()]
+
+
+class MiniMapRenderer:
+    """Мини карта.
+
+    Рисуется упрощенно прямо в своем разрешении: точка на каждую ячейку сетки
+    с едой и ломаная на каждую змею. Перерисовывается раз в refresh_frames
+    кадров, в остальных кадрах используется готовая поверхность.
+    """
+    food_color = PURPLE
+
+    def __init__(self, size, background_color=WHITE,
+                 refresh_frames=MINI_MAP_REFRESH_FRAMES):
+        self.surface = pygame.Surface((size, size))
+        self.background_color = background_color
+        self.refresh_frames = refresh_frames
+        self.frames_to_refresh = 0
+        # Была ли карта перерисована при последнем обращении
+        self.is_changed = False
+
+    def get_surface(self, game):
+        """Поверхность мини карты (перерисовывается, если пора)."""
+        self.is_changed = self.frames_to_refresh <= 0
+        if self.is_changed:
+            self.redraw(game)
+            self.frames_to_refresh = self.refresh_frames
+        self.frames_to_refresh -= 1
+        return self.surface
+
+    def redraw(self, game):
+        """Перерисовка мини карты."""
+        surface = self.surface
+        width, height = surface.get_size()
+        scale_x = width / game.game_rect.width
+        scale_y = height / game.game_rect.height
+        surface.fill(self.background_color)
+
+        grid = game.food_container.grid
+        half_cell = grid.cell_size / 2
+        for (cx, cy), items in grid.cells.items():
+            surface.fill(self.food_color, (
+                int((cx * grid.cell_size + half_cell) * scale_x),
+                int((cy * grid.cell_size + half_cell) * scale_y),
+                1 + (len(items) > 3), 1 + (len(items) > 3),
+            ))
+
+        for snake in game.get_snakes():
+            points = [(x * scale_x, y * scale_y) for x, y in snake.points]
+            line_width = max(1, round(2 * snake.radius * scale_x))
+            if len(points) > 1:
+                pygame.draw.lines(
+                    surface, snake.color, False, points, line_width)
+            else:
+                pygame.draw.circle(surface, snake.color, points[0], line_width)
+
+
+class ProfilerOverlay:
+    """Вывод замеров этапов поверх окна игры.
+
+    Для каждого этапа показываются среднее и 99-й перцентиль длительности по
+    последним замерам и гистограмма их распределения. Текст обновляется раз
+    в refresh_frames кадров.
+    """
+    text_color = BLACK
+    bar_color = BLUE
+    background_color = (255, 255, 255, 200)
+    line_height = 16
+    histogram_width = 60
+
+    def __init__(self, profiler, refresh_frames=15):
+        self.profiler = profiler
+        self.refresh_frames = refresh_frames
+        self.frames_to_refresh = 0
+        self.is_visible = True
+        self.surface = None
+        self.font = None
+
+    def redraw(self):
+        """Перерисовка поверхности с замерами."""
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.SysFont(None, self.line_height + 2)
+        stats = self.profiler.get_stats()
+        lines = [
+            (f'{phase:<16} {phase_stats["mean_ms"]:6.2f} '
+             f'{phase_stats["p99_ms"]:6.2f} ms', phase_stats['histogram'])
+            for phase, phase_stats in stats.items()
+        ]
+        text_width = max(
+            [self.font.size(text)[0] for text, _ in lines], default=0)
+        width = text_width + self.histogram_width + 15
+        self.surface = pygame.Surface(
+            (width, self.line_height * len(lines) + 6), pygame.SRCALPHA)
+        self.surface.fill(self.background_color)
+
+        for i, (text, histogram) in enumerate(lines):
+            y = 3 + i * self.line_height
+            self.surface.blit(
+                self.font.render(text, True, self.text_color), (5, y))
+            # Гистограмма: высота столбца пропорциональна доле замеров
+            bar_width = self.histogram_width // len(histogram)
+            max_count = max(histogram) or 1
+            for j, count in enumerate(histogram):
+                bar_height = round((self.line_height - 4) * count / max_count)
+                self.surface.fill(self.bar_color, (
+                    text_width + 10 + j * bar_width,
+                    y + self.line_height - 2 - bar_height,
+                    bar_width - 1, bar_height,
+                ))
+
+    def draw(self, win):
+        """Вывод замеров в правом верхнем углу окна.
+
+        :return: Область окна с замерами (None, если они скрыты)
+        """
+        if not self.is_visible:
+            return None
+        if self.frames_to_refresh <= 0:
+            self.redraw()
+            self.frames_to_refresh = self.refresh_frames
+        self.frames_to_refresh -= 1
+        return win.blit(
+            self.surface, (win.get_width() - self.surface.get_width(), 0))
@@ -0,0 +1,184 @@
+"""Запись и воспроизведение игр.
+
+Игра полностью определяется параметрами GameLogic, зерном генератора
+случайных чисел и вводом игрока, поэтому запись хранит только их: заголовок
+и события ввода (такт, код события) в двоичном виде. Воспроизведение
+выполняется без окна и без ожидания, с нужного такта можно включить замеры
+этапов.
+
+Запуск из каталога snake:
+    python replay.py game.replay --profile-from 1200
+"""
+import argparse
+import json
+import struct
+
+from helpers import DE
+from exceptions import GameOverException
+from logics import GameLogic
+from loop import run_uncapped
+from profiling import PhaseProfiler
+
+MAGIC = b'SNRP'
+VERSION = 1
+# Сигнатура, версия, зерно, есть ли игрок, количество ботов (-1 - ботов по
+# умолчанию), количество еды, ширина и высота поля, количество тактов,
+# количество событий
+HEADER = struct.Struct('<4sHQ?iIIIII')
+# Такт и код события
+EVENT = struct.Struct('<IB')
+
+# Коды событий ввода: (ключ ввода, значение) -> код
+INPUT_CODES = {
+    ('turning', None): 0,
+    ('turning', DE.LEFT): 1,
+    ('turning', DE.RIGHT): 2,
+    ('boost', False): 3,
+    ('boost', True): 4,
+}
+CODES_INPUTS = {code: key for key, code in INPUT_CODES.items()}
+
+
+class ReplayError(Exception):
+    """Некорректный файл записи."""
+
+
+class Replay:
+    """Запись игры: параметры, зерно и события ввода игрока."""
+
+    def __init__(self, seed, params, ticks=0, events=None):
+        """
+        :param params: Параметры GameLogic (GameLogic.params)
+        :param ticks: Количество начатых тактов
+        :param events: Список событий (такт, код события)
+        """
+        self.seed = seed
+        self.params = dict(params)
+        self.ticks = ticks
+        self.events = events if events is not None else []
+
+    def add_inputs(self, tick, inputs):
+        """Добавление ввода игрока на такте."""
+        for key, value in inputs.items():
+            self.events.append((tick, INPUT_CODES[(key, value)]))
+
+    def get_inputs(self):
+        """Ввод игрока по тактам: {номер такта: ввод}."""
+        inputs = {}
+        for tick, code in self.events:
+            key, value = CODES_INPUTS[code]
+            inputs.setdefault(tick, {})[key] = value
+        return inputs
+
+    def create_game(self):
+        """Создание игры в начальном состоянии записи."""
+        return GameLogic(seed=self.seed, **self.params)
+
+    def to_bytes(self):
+        params = self.params
+        bots_count = params['bots_count']
+        data = bytearray(HEADER.pack(
+            MAGIC, VERSION, self.seed, params['with_player'],
+            -1 if bots_count is None else bots_count, params['food_count'],
+            params['width'], params['height'], self.ticks, len(self.events),
+        ))
+        for event in self.events:
+            data += EVENT.pack(*event)
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ReplayError('Файл записи слишком короткий')
+        (magic, version, seed, with_player, bots_count, food_count, width,
+         height, ticks, events_count) = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReplayError('Файл не является записью игры')
+        if version != VERSION:
+            raise ReplayError(f'Неподдерживаемая версия записи: {version}')
+        if len(data) != HEADER.size + events_count * EVENT.size:
+            raise ReplayError('Размер файла не совпадает с заголовком')
+        params = dict(
+            with_player=with_player,
+            bots_count=None if bots_count < 0 else bots_count,
+            food_count=food_count, width=width, height=height,
+        )
+        events = list(EVENT.iter_unpack(data[HEADER.size:]))
+        return cls(seed, params, ticks, events)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class ReplayRecorder:
+    """Запись игры: подключается к GameLogic как наблюдатель ввода."""
+
+    def __init__(self, game):
+        self.replay = Replay(game.seed, game.params)
+        game.add_input_observer(self)
+
+    def __call__(self, tick, inputs):
+        self.replay.ticks = tick + 1
+        if inputs:
+            self.replay.add_inputs(tick, inputs)
+
+    def save(self, path):
+        self.replay.save(path)
+
+
+def play(replay, game=None, max_ticks=None):
+    """Воспроизведение записи без окна и без ожидания.
+
+    :param game: Игра, созданная по записи (если нужно подключить
+        наблюдателей или продолжить воспроизведение)
+    :param max_ticks: Такт, до которого воспроизводить (по умолчанию - до
+        конца записи)
+    :return: Игра после воспроизведения
+    """
+    game = game or replay.create_game()
+    max_ticks = replay.ticks if max_ticks is None else min(
+        max_ticks, replay.ticks)
+    try:
+        run_uncapped(game, max_ticks, replay.get_inputs())
+    except GameOverException:
+        pass
+    return game
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='файл записи')
+    parser.add_argument('--profile-from', type=int, default=None,
+                        help='такт, с которого замерять этапы')
+    parser.add_argument('--until', type=int, default=None,
+                        help='такт, до которого воспроизводить')
+    parser.add_argument('-o', '--output', help='файл для замеров (.json/.csv)')
+    args = parser.parse_args(argv)
+
+    replay = Replay.load(args.path)
+    game = replay.create_game()
+    profiler = None
+    if args.profile_from is not None:
+        play(replay, game, args.profile_from)
+        profiler = PhaseProfiler()
+        profiler.attach(game, GameLogic.profiled_phases)
+    play(replay, game, args.until)
+
+    result = {'seed': replay.seed, 'ticks': game.tick,
+              'snakes_alive': len(game.get_snakes())}
+    if profiler:
+        profiler.detach()
+        result['phases'] = profiler.get_stats()
+        if args.output:
+            profiler.dump(args.output)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""Параллельный прогон матчей ботов без окна.
+
+Матчи с разными зернами генератора случайных чисел выполняются в пуле
+процессов. Результаты выводятся по одному JSON-объекту на строку по мере
+завершения матчей, сводка - в stderr. Параметры классов игры и настройки
+можно переопределить для всех матчей прогона
+(--set BotSnake.probe_distance=70, --set settings.TICK_RATE=60) или
+перебрать (--sweep "BotSnake.probe_distance=[50, 70, 90]"): тогда для
+каждого набора значений выполняются матчи с одними и теми же зернами.
+
+Запуск из каталога snake:
+    python runner.py -n 1000 --ticks 3000 --bots 8 > results.jsonl
+"""
+import argparse
+import ast
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import settings
+from settings import HEIGHT, INITIAL_FOOD_COUNT, WIDTH
+from helpers import DeathCauseEnum
+from base_classes import BaseSnake
+from logics import BotSnake, FoodContainer, GameLogic, SnakeContainer
+from loop import run_uncapped
+
+# Классы, параметры которых можно переопределять
+OVERRIDE_TARGETS = {
+    cls.__name__: cls
+    for cls in (BaseSnake, BotSnake, FoodContainer, SnakeContainer, GameLogic)
+}
+# Каталог модулей игры (настройки копируются в них через import *)
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_setting_modules(name):
+    """Модули игры, в которых есть настройка name."""
+    modules = []
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if (path and os.path.dirname(os.path.abspath(path)) == GAME_DIR
+                and name in vars(module)):
+            modules.append(module)
+    return modules
+
+
+def parse_override(text):
+    """Разбор переопределения вида 'Класс.атрибут=значение'."""
+    name, sep, value = text.partition('=')
+    target, _, attr = name.strip().partition('.')
+    if not sep or not attr:
+        raise ValueError(f'Ожидается Класс.атрибут=значение: {text!r}')
+    try:
+        value = ast.literal_eval(value.strip())
+    except (ValueError, SyntaxError):
+        raise ValueError(f'Некорректное значение: {text!r}') from None
+    return f'{target}.{attr}', value
+
+
+@contextmanager
+def overridden(overrides):
+    """Временное переопределение атрибутов классов игры и настроек.
+
+    Настройка меняется во всех модулях игры, которые её импортировали, но
+    не в атрибутах классов, которые получили её значение при определении.
+
+    :param overrides: Словарь {'Класс.атрибут': значение,
+        'settings.НАСТРОЙКА': значение}
+    """
+    originals = []
+    try:
+        for name, value in overrides.items():
+            target_name, _, attr = name.partition('.')
+            if target_name == 'settings' and hasattr(settings, attr):
+                targets = get_setting_modules(attr)
+            else:
+                target = OVERRIDE_TARGETS.get(target_name)
+                if target is None or not hasattr(target, attr):
+                    raise ValueError(f'Неизвестный параметр: {name}')
+                targets = [target]
+            for target in targets:
+                originals.append((target, attr, vars(target).get(attr, None),
+                                  attr in vars(target)))
+                setattr(target, attr, value)
+        yield
+    finally:
+        for target, attr, value, is_own in reversed(originals):
+            if is_own:
+                setattr(target, attr, value)
+            else:
+                delattr(target, attr)
+
+
+def run_match(job):
+    """Прогон одного матча.
+
+    :param job: Словарь с ключами seed, ticks, bots, food_count, width,
+        height, point (номер набора переопределений) и overrides
+    :return: Словарь с результатами матча
+    """
+    start = time.perf_counter()
+    with overridden(job.get('overrides') or {}):
+        game = GameLogic(
+            with_player=False, bots_count=job['bots'],
+            food_count=job.get('food_count', INITIAL_FOOD_COUNT),
+            width=job.get('width', WIDTH), height=job.get('height', HEIGHT),
+            seed=job['seed'])
+        run_uncapped(game, job['ticks'])
+
+    # Время жизни погибших змей и змей, доживших до конца матча
+    survival_ticks = [death.tick - death.birth_tick for death in game.deaths]
+    survival_ticks.extend(
+        game.tick - snake.birth_tick for snake in game.get_snakes())
+    deaths_by_cause = Counter(death.cause for death in game.deaths)
+    return {
+        'seed': job['seed'],
+        'point': job.get('point', 0),
+        'overrides': job.get('overrides') or {},
+        'ticks': game.tick,
+        'survival_ticks': survival_ticks,
+        'final_lengths': [snake.length for snake in game.get_snakes()],
+        'dead_lengths': [death.length for death in game.deaths],
+        'deaths_by_cause': {
+            cause: deaths_by_cause[cause] for cause in DeathCauseEnum.values},
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def get_jobs(count, ticks, bots, seed=0, overrides=None,
+             food_count=INITIAL_FOOD_COUNT, width=WIDTH, height=HEIGHT):
+    """Задания на count матчей с зернами seed, seed + 1, ...
+
+    :param overrides: Переопределения для всех матчей (словарь) или список
+        наборов переопределений (точек перебора): для каждого набора
+        выполняются count матчей с теми же зернами
+    """
+    if overrides is None or isinstance(overrides, dict):
+        overrides = [overrides or {}]
+    return [
+        dict(seed=seed + i, ticks=ticks, bots=bots, food_count=food_count,
+             width=width, height=height, point=point,
+             overrides=point_overrides)
+        for point, point_overrides in enumerate(overrides)
+        for i in range(count)
+    ]
+
+
+def get_sweep_points(overrides, sweeps):
+    """Наборы переопределений для перебора всех сочетаний значений.
+
+    :param overrides: Общие переопределения
+    :param sweeps: Словарь {параметр: список значений}
+    """
+    names = list(sweeps)
+    return [
+        dict(overrides, **dict(zip(names, values)))
+        for values in itertools.product(*sweeps.values())
+    ]
+
+
+def run_matches(count, ticks, bots, seed=0, overrides=None, processes=None,
+                **game_params):
+    """Параллельный прогон матчей.
+
+    Генератор: результаты возвращаются в порядке завершения матчей.
+
+    :param overrides: См. get_jobs
+    :param processes: Количество процессов (по умолчанию - по числу ядер);
+        при 1 матчи выполняются в текущем процессе
+    :param game_params: food_count, width, height
+    """
+    jobs = get_jobs(count, ticks, bots, seed, overrides, **game_params)
+    if processes == 1:
+        yield from map(run_match, jobs)
+        return
+    with multiprocessing.Pool(processes) as pool:
+        # По одному матчу на задание: матчи длятся по-разному, так нагрузка
+        # распределяется равномернее
+        yield from pool.imap_unordered(run_match, jobs, chunksize=1)
+
+
+def get_summary(results):
+    """Сводка по результатам матчей."""
+    survival_ticks = [t for result in results for t in result['survival_ticks']]
+    final_lengths = [n for result in results for n in result['final_lengths']]
+    deaths_by_cause = Counter()
+    for result in results:
+        deaths_by_cause.update(result['deaths_by_cause'])
+    return {
+        'matches': len(results),
+        'mean_survival_ticks': (
+            sum(survival_ticks) / len(survival_ticks) if survival_ticks
+            else None),
+        'mean_final_length': (
+            sum(final_lengths) / len(final_lengths) if final_lengths
+            else None),
+        'deaths_by_cause': dict(deaths_by_cause),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--matches', type=int, default=100)
+    parser.add_argument('--ticks', type=int, default=3000)
+    parser.add_argument('--bots', type=int, default=8)
+    parser.add_argument('--food', type=int, default=INITIAL_FOOD_COUNT,
+                        help='начальное количество еды')
+    parser.add_argument('--width', type=int, default=WIDTH)
+    parser.add_argument('--height', type=int, default=HEIGHT)
+    parser.add_argument('--seed', type=int, default=0,
+                        help='зерно первого матча')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='количество процессов (по умолчанию - все ядра)')
+    parser.add_argument('--set', action='append', default=[], dest='overrides',
+                        metavar='CLASS.ATTR=VALUE',
+                        help='переопределение параметра для всех матчей')
+    parser.add_argument('--sweep', action='append', default=[],
+                        metavar='CLASS.ATTR=[VALUE, ...]',
+                        help='перебор значений параметра (с несколькими '
+                             '--sweep - всех сочетаний)')
+    args = parser.parse_args(argv)
+
+    try:
+        overrides = dict(map(parse_override, args.overrides))
+        sweeps = dict(map(parse_override, args.sweep))
+        if not all(isinstance(values, (list, tuple)) and values
+                   for values in sweeps.values()):
+            raise ValueError('Для --sweep ожидается непустой список значений')
+        points = get_sweep_points(overrides, sweeps)
+        # Проверка имен до запуска процессов
+        for point in points:
+            with overridden(point):
+                pass
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.perf_counter()
+    results = []
+    for result in run_matches(
+            args.matches, args.ticks, args.bots, args.seed, points,
+            args.processes, food_count=args.food, width=args.width,
+            height=args.height):
+        results.append(result)
+        print(json.dumps(result), flush=True)
+    seconds = time.perf_counter() - start
+    summary = dict(
+        get_summary(results), seconds=seconds,
+        matches_per_second=len(results) / seconds if seconds else None)
+    if len(points) > 1:
+        summary['points'] = [
+            dict(overrides=point, **get_summary(
+                [result for result in results if result['point'] == number]))
+            for number, point in enumerate(points)
+        ]
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
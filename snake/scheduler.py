@@ -0,0 +1,56 @@
+import heapq
+import itertools
+
+
+class TickScheduler:
+    """Планировщик сроков по тактам игры.
+
+    Хранит для каждого ключа один срок (номер такта) в куче. При переносе
+    или отмене срока старая запись остается в куче, но становится
+    устаревшей: у ключа меняется токен, и запись пропускается при извлечении.
+    """
+
+    def __init__(self, tick=0):
+        # Текущий такт игры
+        self.tick = tick
+        # Куча записей (такт, токен, ключ)
+        self.heap = []
+        # Ключ -> токен актуальной записи
+        self.tokens = {}
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def schedule(self, key, delay):
+        """Установка срока для ключа через delay тактов от текущего."""
+        return self.schedule_at(key, self.tick + delay)
+
+    def schedule_at(self, key, tick):
+        """Установка (или перенос) срока для ключа на такт tick."""
+        token = next(self.counter)
+        self.tokens[key] = token
+        heapq.heappush(self.heap, (tick, token, key))
+        return token
+
+    def cancel(self, key):
+        """Отмена срока для ключа."""
+        self.tokens.pop(key, None)
+
+    def pop_due(self, tick=None):
+        """Извлечение ключей со сроком не позже такта tick (по умолчанию -
+        текущего) в порядке сроков."""
+        tick = self.tick if tick is None else tick
+        heap, tokens = self.heap, self.tokens
+        due = []
+        while heap and heap[0][0] <= tick:
+            _, token, key = heapq.heappop(heap)
+            if tokens.get(key) == token:
+                del tokens[key]
+                due.append(key)
+        # Если устаревших записей стало слишком много, перестраиваем кучу
+        if len(heap) > 2 * len(tokens) + 64:
+            self.heap = [item for item in heap
+                         if tokens.get(item[2]) == item[1]]
+            heapq.heapify(self.heap)
+        return due
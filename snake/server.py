@@ -0,0 +1,541 @@
+"""Сервер для игры нескольких игроков по сети.
+
+Сервер ведет игру (GameLogic) и сам выполняет такты с частотой TICK_RATE.
+Клиенты подключаются по TCP и обмениваются с сервером JSON-сообщениями, по
+одному на строку.
+
+Клиент -> сервер:
+    {"type": "input", "turning": "left" | "right" | null, "boost": true}
+    {"type": "respawn"} - новая змея после гибели
+
+Сервер -> клиент:
+    {"type": "welcome", ...} - размеры поля и области видимости
+    {"type": "spawn", "id": ...} - id новой змеи клиента
+    {"type": "state", "tick": ..., "center": [x, y], ...} - каждый такт
+    {"type": "death", "tick": ..., "cause": ..., "length": ...}
+
+Состояние содержит только змей и еду в области вокруг головы змеи клиента
+(после гибели - вокруг места гибели) и передается как разница с последним
+отправленным клиенту состоянием (см. ClientView и ClientWorld.apply).
+Координаты округляются до целых.
+
+Запуск из каталога snake:
+    python server.py --bots 30 --width 4000 --height 4000
+    python server.py --clients 10 --ticks 600
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+
+import pygame
+
+from settings import *
+from helpers import DE
+from logics import Food, GameLogic
+from spatial import RectGrid
+
+
+def encode_message(message):
+    """Сообщение в виде строки JSON."""
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+def get_snake_rect(snake):
+    """Прямоугольник, который занимает змея."""
+    box = snake.bounding_box
+    radius = math.ceil(snake.radius)
+    left, top = int(box.left) - radius, int(box.top) - radius
+    return pygame.Rect(left, top, int(box.right) + radius - left + 1,
+                       int(box.bottom) + radius - top + 1)
+
+
+def get_snake_points(snake, cache):
+    """Округленные координаты элементов змеи [x0, y0, x1, y1, ...].
+
+    :param cache: Словарь змея -> координаты, общий для всех клиентов на
+        одном такте
+    """
+    points = cache.get(snake)
+    if points is None:
+        points = cache[snake] = [
+            round(value) for point in snake.points for value in point]
+    return points
+
+
+class ClientView:
+    """Состояние игры, известное клиенту.
+
+    Обновление для клиента - разница между тем, что видно сейчас, и тем, что
+    было ему отправлено. Известное состояние меняется (commit) только после
+    отправки, поэтому пропущенное обновление учитывается в следующем.
+    """
+
+    def __init__(self, size=SERVER_VIEW_SIZE):
+        self.size = size
+        # id змеи -> (змея, радиус, координаты элементов)
+        self.snakes = {}
+        # id еды -> (еда, поколение)
+        self.food = {}
+
+    def get_rect(self, center):
+        """Область видимости с центром в точке."""
+        rect = pygame.Rect((0, 0), self.size)
+        rect.center = (round(center[0]), round(center[1]))
+        return rect
+
+    def get_snakes_update(self, snakes, points_cache):
+        """Обновление змей: (записи змей, исчезнувшие id, известные змеи)."""
+        entries, gone, known = [], [], {}
+        for snake in snakes:
+            points = get_snake_points(snake, points_cache)
+            radius = round(snake.radius, 1)
+            known[snake.id] = (snake, radius, points)
+            old = self.snakes.get(snake.id)
+            if old is None or old[0] is not snake:
+                # id погибшей змеи мог достаться новой
+                if old is not None:
+                    gone.append(snake.id)
+                entries.append({'id': snake.id, 'color': list(snake.color),
+                                'radius': radius, 'points': points})
+                continue
+            _, old_radius, old_points = old
+            # Змея описывается изменениями координат ее элементов (если змея
+            # стала короче, изменений меньше, чем старых координат)
+            delta = [new - prev for prev, new in zip(old_points, points)]
+            tail = points[len(old_points):]
+            if not tail and radius == old_radius and not any(delta):
+                continue
+            entry = {'id': snake.id, 'delta': delta}
+            if tail:
+                entry['tail'] = tail
+            if radius != old_radius:
+                entry['radius'] = radius
+            entries.append(entry)
+        gone.extend(snake_id for snake_id in self.snakes
+                    if snake_id not in known)
+        return entries, gone, known
+
+    def get_food_update(self, food_container, rect):
+        """Обновление еды: (новая еда, исчезнувшие id, известная еда)."""
+        margin = math.ceil(food_container.max_food_radius)
+        area = rect.inflate(2 * margin, 2 * margin)
+        added, gone, known = [], [], {}
+        for x, y, food in food_container.grid.iter_rect(
+                area.left, area.top, area.right, area.bottom):
+            if not area.collidepoint(x, y):
+                continue
+            known[food.id] = (food, food.generation)
+            old = self.food.get(food.id)
+            if old is not None and old[0] is food and old[1] == food.generation:
+                continue
+            if old is not None:
+                gone.append(food.id)
+            added.append([food.id, round(x), round(y)])
+        gone.extend(food_id for food_id in self.food if food_id not in known)
+        return added, gone, known
+
+    def get_update(self, game, snakes_grid, center, points_cache=None):
+        """Обновление для клиента.
+
+        :param snakes_grid: RectGrid прямоугольников змей (get_snake_rect)
+        :return: Пара (сообщение, известное состояние для commit)
+        """
+        rect = self.get_rect(center)
+        snakes, snakes_gone, known_snakes = self.get_snakes_update(
+            snakes_grid.get_owners(rect),
+            {} if points_cache is None else points_cache)
+        food, food_gone, known_food = self.get_food_update(
+            game.food_container, rect)
+        message = {'type': 'state', 'tick': game.tick, 'center': rect.center}
+        # Пустые списки не передаются
+        for key, value in (('gone', snakes_gone), ('snakes', snakes),
+                           ('food_gone', food_gone), ('food', food)):
+            if value:
+                message[key] = value
+        return message, (known_snakes, known_food)
+
+    def commit(self, known):
+        """Учет отправленного обновления."""
+        self.snakes, self.food = known
+
+
+class ClientWorld:
+    """Видимая клиенту часть игры, восстановленная из обновлений."""
+
+    def __init__(self):
+        self.tick = None
+        self.center = None
+        # id змеи -> {'color': ..., 'radius': ..., 'points': [x0, y0, ...]}
+        self.snakes = {}
+        # id еды -> (x, y)
+        self.food = {}
+
+    def apply(self, message):
+        """Применение сообщения state."""
+        self.tick = message['tick']
+        self.center = tuple(message['center'])
+        for snake_id in message.get('gone', ()):
+            self.snakes.pop(snake_id, None)
+        for entry in message.get('snakes', ()):
+            if 'points' in entry:
+                self.snakes[entry['id']] = {
+                    'color': entry['color'], 'radius': entry['radius'],
+                    'points': entry['points']}
+                continue
+            snake = self.snakes[entry['id']]
+            snake['points'] = [
+                value + delta
+                for value, delta in zip(snake['points'], entry['delta'])
+            ] + entry.get('tail', [])
+            if 'radius' in entry:
+                snake['radius'] = entry['radius']
+        for food_id in message.get('food_gone', ()):
+            self.food.pop(food_id, None)
+        for food_id, x, y in message.get('food', ()):
+            self.food[food_id] = (x, y)
+
+
+class Client:
+    """Подключенный к серверу клиент."""
+
+    def __init__(self, reader, writer, view):
+        self.reader = reader
+        self.writer = writer
+        self.view = view
+        self.snake = None
+        # Центр области видимости (голова змеи или место ее гибели)
+        self.center = None
+        # Ввод, полученный после прошлого такта
+        self.inputs = {}
+        self.wants_spawn = True
+        self.is_closed = False
+        # Количество пропущенных из-за медленного соединения обновлений
+        self.skipped_updates = 0
+
+
+class GameServer:
+    """Сервер игры: ведет игру и рассылает клиентам обновления."""
+    # Объем неотправленных клиенту данных, при котором обновления ему не
+    # отправляются, пока он не догонит
+    max_write_buffer = 256 * 1024
+    # Размер ячейки сетки змей для выбора видимых змей
+    interest_cell_size = 400
+
+    def __init__(self, game=None, view_size=SERVER_VIEW_SIZE,
+                 tick_rate=TICK_RATE, **game_kwargs):
+        """
+        :param game: Игра (по умолчанию создается игра без игрока с
+            параметрами game_kwargs)
+        """
+        self.game = game or GameLogic(with_player=False, **game_kwargs)
+        self.view_size = view_size
+        self.tick_rate = tick_rate
+        self.clients = []
+        # Задачи приема сообщений клиентов
+        self.handlers = set()
+        self.server = None
+        self.bytes_sent = 0
+
+    async def start(self, host=SERVER_HOST, port=SERVER_PORT):
+        """Запуск приема подключений. Возвращает порт сервера."""
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Остановка сервера и отключение клиентов."""
+        if self.server is not None:
+            self.server.close()
+        for client in self.clients:
+            client.writer.close()
+        # После закрытия соединения задачи приема завершаются сами
+        await asyncio.gather(*self.handlers)
+        if self.server is not None:
+            await self.server.wait_closed()
+
+    async def handle_client(self, reader, writer):
+        """Прием сообщений клиента."""
+        client = Client(reader, writer, ClientView(self.view_size))
+        self.clients.append(client)
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        self.send(client, self.get_welcome())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    self.handle_message(client, json.loads(line))
+                except (ValueError, TypeError) as e:
+                    self.send(client, {'type': 'error', 'message': str(e)})
+        except ConnectionError:
+            pass
+        finally:
+            client.is_closed = True
+            writer.close()
+            self.handlers.discard(task)
+
+    def get_welcome(self):
+        game_rect = self.game.game_rect
+        return {
+            'type': 'welcome',
+            'width': game_rect.width,
+            'height': game_rect.height,
+            'tick_rate': self.tick_rate,
+            'view': list(self.view_size),
+            'food_radius': Food.radius,
+            'food_color': list(Food.color),
+        }
+
+    def handle_message(self, client, message):
+        """Обработка сообщения клиента (ввод применяется на следующем
+        такте)."""
+        if not isinstance(message, dict):
+            raise TypeError('Сообщение должно быть объектом JSON')
+        kind = message.get('type')
+        if kind == 'input':
+            if 'turning' in message:
+                turning = message['turning']
+                if turning is not None and turning not in DE.LEFT_RIGHT:
+                    raise ValueError('Неверное направление поворота')
+                client.inputs['turning'] = turning
+            if 'boost' in message:
+                client.inputs['boost'] = bool(message['boost'])
+        elif kind == 'respawn':
+            if client.snake is None:
+                client.wants_spawn = True
+        else:
+            raise ValueError(f'Неизвестный тип сообщения: {kind!r}')
+
+    def send(self, client, message, droppable=False):
+        """Отправка сообщения клиенту.
+
+        :param droppable: Не отправлять, если клиент не успевает принимать
+        :return: Отправлено ли сообщение
+        """
+        if client.is_closed or client.writer.is_closing():
+            return False
+        transport = client.writer.transport
+        if droppable and (
+                transport.get_write_buffer_size() > self.max_write_buffer):
+            client.skipped_updates += 1
+            return False
+        data = encode_message(message)
+        client.writer.write(data)
+        self.bytes_sent += len(data)
+        return True
+
+    def remove_closed_clients(self):
+        """Удаление отключившихся клиентов и их змей."""
+        for client in [c for c in self.clients if c.is_closed]:
+            self.clients.remove(client)
+            if client.snake is not None and client.snake.is_alive:
+                self.game.snake_is_dead(client.snake)
+
+    def build_snakes_grid(self):
+        """Сетка прямоугольников живых змей."""
+        grid = RectGrid(self.interest_cell_size)
+        for snake in self.game.get_snakes():
+            grid.insert(get_snake_rect(snake), snake)
+        return grid
+
+    def tick(self):
+        """Один такт: появление змей, применение ввода, такт игры и
+        рассылка обновлений."""
+        game = self.game
+        self.remove_closed_clients()
+        for client in self.clients:
+            if client.wants_spawn:
+                client.wants_spawn = False
+                client.snake = game.add_player_snake()
+                self.send(client, {'type': 'spawn', 'id': client.snake.id})
+            if client.snake is not None and client.inputs:
+                game.apply_inputs(client.inputs, client.snake)
+            client.inputs = {}
+
+        deaths_count = len(game.deaths)
+        game.step()
+        deaths = game.deaths[deaths_count:]
+
+        grid = self.build_snakes_grid()
+        points_cache = {}
+        for client in self.clients:
+            snake = client.snake
+            if snake is not None and snake.is_alive:
+                client.center = snake.head_xy
+            elif snake is not None:
+                # id погибшей змеи мог достаться новому боту, который тоже
+                # погиб, но его запись идет позже; змею, убранную без записи
+                # о гибели, считаем погибшей без причины
+                death = next((d for d in deaths if d.id == snake.id), None)
+                self.send(client, {
+                    'type': 'death', 'tick': game.tick,
+                    'cause': death.cause if death else None,
+                    'length': death.length if death else snake.length,
+                })
+                client.snake = None
+            if client.center is None:
+                continue
+            message, known = client.view.get_update(
+                game, grid, client.center, points_cache)
+            if self.send(client, message, droppable=True):
+                client.view.commit(known)
+
+    async def run(self, max_ticks=None):
+        """Выполнение тактов с частотой tick_rate (при отставании лишнее
+        время отбрасывается)."""
+        loop = asyncio.get_running_loop()
+        tick_duration = 1 / self.tick_rate
+        next_time = loop.time()
+        while max_ticks is None or self.game.tick < max_ticks:
+            self.tick()
+            next_time += tick_duration
+            delay = next_time - loop.time()
+            if delay < 0:
+                next_time -= delay
+                delay = 0
+            await asyncio.sleep(delay)
+
+
+class BotClient:
+    """Скриптовый клиент: поворачивает к ближайшей видимой еде и после
+    гибели появляется заново."""
+
+    def __init__(self):
+        self.reader = self.writer = None
+        self.world = ClientWorld()
+        self.welcome = None
+        self.snake_id = None
+        self.turning = None
+        self.deaths = 0
+        self.bytes_received = 0
+
+    async def connect(self, host=SERVER_HOST, port=SERVER_PORT):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    def send(self, message):
+        self.writer.write(encode_message(message))
+
+    def get_turning(self):
+        """Поворот к ближайшей еде."""
+        snake = self.world.snakes.get(self.snake_id)
+        if snake is None or len(snake['points']) < 4 or not self.world.food:
+            return None
+        head_x, head_y, neck_x, neck_y = snake['points'][:4]
+        food_x, food_y = min(
+            self.world.food.values(),
+            key=lambda pos: (pos[0] - head_x) ** 2 + (pos[1] - head_y) ** 2)
+        # Знак векторного произведения направления движения и направления на
+        # еду (ось y направлена вниз, поэтому положительный - поворот вправо)
+        cross = ((head_x - neck_x) * (food_y - head_y) -
+                 (head_y - neck_y) * (food_x - head_x))
+        if cross > 0:
+            return DE.RIGHT
+        if cross < 0:
+            return DE.LEFT
+        return None
+
+    async def receive(self):
+        """Получение и обработка одного сообщения (None - соединение
+        закрыто)."""
+        try:
+            line = await self.reader.readline()
+        except ConnectionError:
+            return None
+        if not line:
+            return None
+        self.bytes_received += len(line)
+        message = json.loads(line)
+        kind = message['type']
+        if kind == 'welcome':
+            self.welcome = message
+        elif kind == 'spawn':
+            self.snake_id = message['id']
+        elif kind == 'death':
+            self.deaths += 1
+            self.snake_id = None
+            self.send({'type': 'respawn'})
+        elif kind == 'state':
+            self.world.apply(message)
+            turning = self.get_turning()
+            if turning != self.turning:
+                self.turning = turning
+                self.send({'type': 'input', 'turning': turning})
+        return message
+
+    async def receive_state(self):
+        """Получение сообщений до очередного состояния."""
+        while True:
+            message = await self.receive()
+            if message is None or message['type'] == 'state':
+                return message
+
+    async def run(self, host=SERVER_HOST, port=SERVER_PORT, ticks=None):
+        """Игра в течение ticks тактов (по умолчанию - до отключения)."""
+        await self.connect(host, port)
+        states = 0
+        while ticks is None or states < ticks:
+            if await self.receive_state() is None:
+                break
+            states += 1
+        await self.close()
+        return states
+
+
+async def run_clients(count, host, port, ticks):
+    clients = [BotClient() for _ in range(count)]
+    await asyncio.gather(*(client.run(host, port, ticks) for client in clients))
+    return {
+        'clients': count,
+        'deaths': sum(client.deaths for client in clients),
+        'bytes_per_tick': sum(
+            client.bytes_received for client in clients) / count / ticks,
+    }
+
+
+async def serve(host, port, **game_kwargs):
+    server = GameServer(**game_kwargs)
+    port = await server.start(host, port)
+    print(f'Сервер запущен: {host}:{port}', file=sys.stderr)
+    try:
+        await server.run()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--bots', type=int, default=None)
+    parser.add_argument('--width', type=int, default=WIDTH)
+    parser.add_argument('--height', type=int, default=HEIGHT)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--clients', type=int, default=None,
+                        help='запустить указанное количество клиентов-ботов '
+                             'вместо сервера')
+    parser.add_argument('--ticks', type=int, default=600,
+                        help='количество тактов для клиентов-ботов')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.clients:
+            result = asyncio.run(run_clients(
+                args.clients, args.host, args.port, args.ticks))
+            print(json.dumps(result, indent=2))
+        else:
+            asyncio.run(serve(args.host, args.port, bots_count=args.bots,
+                              width=args.width, height=args.height,
+                              seed=args.seed))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -14,14 +14,45 @@ GAME_DEFAULT_COLOR = BLACK
 GAME_BACKGROUND_COLOR = (248, 241, 255)
 # Ширина и высота игрового поля
 WIDTH = HEIGHT = 1500
+# Размер плитки, из которых состоит поверхность игрового поля
+TILE_SIZE = 256
+# Количество хранимых изображений кругов (цвет, радиус)
+SPRITE_CACHE_SIZE = 256
+# Выводить в окно только изменившиеся области (для слабых устройств)
+DIRTY_RECTS = False
+# Размер области в центре окна, в которой голова змеи движется без сдвига
+# камеры (при DIRTY_RECTS, чтобы окно не выводилось целиком каждый кадр)
+CAMERA_DEAD_ZONE = (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)
 SHOW_MINI_MAP = True
 MINI_MAP_SIZE = 200
-# Частота кадров в секунду
+# Мини карта перерисовывается раз в указанное количество кадров
+MINI_MAP_REFRESH_FRAMES = 5
+# Частота кадров в секунду (0 - без ограничения)
 FPS = 30
+# Количество тактов игры в секунду (не зависит от частоты кадров)
+TICK_RATE = 30
+# Максимальное количество тактов за один кадр при отставании симуляции
+MAX_CATCH_UP_TICKS = 5
+# Выполнять такты подряд так быстро, как возможно, без привязки ко времени
+# (для прогонов без игрока); кадры выводятся с частотой FPS
+UNCAPPED_SIMULATION = False
 # Отображение вспомогательных объектов
 DRAW_FOOD_PATH = True
 DRAW_COLLISION_AVOIDING_LINES = False
 DRAW_COLLISION_RECTANGLES = False
+# Профилирование этапов игры (F3 - показать/скрыть замеры на экране)
+PROFILING = False
+# Количество последних замеров каждого этапа для статистики
+PROFILER_WINDOW = 300
+# Файл для сохранения замеров по окончании игры (.json или .csv)
+PROFILER_DUMP_PATH = None
+# Файл для записи игры (зерно и ввод игрока) по окончании игры
+REPLAY_PATH = None
+# Сетевая игра (server.py): адрес сервера и размер области вокруг головы
+# змеи, о которой сервер сообщает клиенту
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+SERVER_VIEW_SIZE = (WINDOW_WIDTH, WINDOW_HEIGHT)
 # Количество еды
 MAX_FOOD_COUNT = 200
 INITIAL_FOOD_COUNT = 500
@@ -0,0 +1,383 @@
+"""Снимки состояния игры в двоичном виде.
+
+Снимок содержит все, что нужно для продолжения игры с того же такта с тем же
+результатом: параметры игры, состояние генератора случайных чисел, змей, еду,
+сроки ботов и кандидатов выбора еды. Данные хранятся не по объектам, а
+столбцами - массивами чисел (array), поэтому снимок записывается и читается
+без сериализации отдельных объектов.
+
+Формат (все числа little-endian):
+    заголовок HEADER: сигнатура, версия, количество разделов;
+    таблица разделов SECTION: имя, тип элементов ('q' или 'd'), смещение от
+        начала снимка и количество элементов;
+    данные разделов, выровненные по 8 байт.
+Неизвестные разделы при чтении пропускаются, поэтому в новых версиях можно
+добавлять разделы, не ломая чтение старых снимков.
+
+При чтении из bytes, memoryview или mmap разделы остаются представлениями
+memoryview исходного буфера (без копирования), например, для передачи
+состояния наблюдателям.
+
+Запуск из каталога snake:
+    python snapshot.py game.snapshot
+"""
+import argparse
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from helpers import DeathCauseEnum
+from logics import BotSnake, Food, GameLogic, Snake, SnakeDeath
+
+MAGIC = b'SNSS'
+VERSION = 1
+# Сигнатура, версия, количество разделов
+HEADER = struct.Struct('<4sHI')
+# Имя раздела, тип элементов, смещение, количество элементов
+SECTION = struct.Struct('<4sc2xQQ')
+ALIGNMENT = 8
+
+# Поля разделов с записями фиксированной длины
+GAME_FIELDS = (
+    'seed', 'tick', 'with_player', 'bots_count', 'food_count', 'width',
+    'height', 'main_snake_id', 'snakes_last_id', 'food_last_id',
+    'food_insert_version',
+)
+SNAKE_INT_FIELDS = (
+    'id', 'is_bot', 'birth_tick', 'length', 'r', 'g', 'b', 'turning',
+    'boost', 'food_expired', 'food_id', 'food_generation',
+)
+SNAKE_FLOAT_FIELDS = ('angle', 'current_speed', 'radius')
+FOOD_INT_FIELDS = ('id', 'generation', 'r', 'g', 'b')
+FOOD_FLOAT_FIELDS = ('x', 'y', 'radius')
+DEATH_FIELDS = ('id', 'birth_tick', 'tick', 'cause', 'length')
+SCHEDULE_FIELDS = ('bot_id', 'tick')
+TARGET_INT_FIELDS = ('bot_id', 'version', 'count')
+TARGET_FLOAT_FIELDS = ('x', 'y', 'radius')
+CANDIDATE_FIELDS = ('id', 'generation')
+
+# Разделы: имя -> тип элементов
+SECTIONS = {
+    # Поля GAME_FIELDS
+    b'GAME': 'q',
+    # Состояние генератора: версия и внутреннее состояние, gauss_next
+    b'RAND': 'q',
+    b'RNDG': 'd',
+    # Змеи в порядке контейнера: SNAKE_*_FIELDS, координаты всех элементов
+    b'SNKI': 'q',
+    b'SNKF': 'd',
+    b'SNKX': 'd',
+    b'SNKY': 'd',
+    # Еда в порядке контейнера: FOOD_*_FIELDS
+    b'FODI': 'q',
+    b'FODF': 'd',
+    # Освободившиеся id змей и еды
+    b'SFRE': 'q',
+    b'FFRE': 'q',
+    # Сроки ботов в порядке извлечения: SCHEDULE_FIELDS
+    b'SCHD': 'q',
+    # Записи о гибели: DEATH_FIELDS
+    b'DTHS': 'q',
+    # Кандидаты выбора еды: TARGET_*_FIELDS, CANDIDATE_FIELDS кандидатов
+    b'TGTI': 'q',
+    b'TGTF': 'd',
+    b'TGTC': 'q',
+}
+
+TURNING_CODES = {None: 0, 'left': 1, 'right': 2}
+CODES_TURNING = {code: turning for turning, code in TURNING_CODES.items()}
+
+
+class SnapshotError(Exception):
+    """Некорректный снимок."""
+
+
+def iter_rows(values, fields):
+    """Перебор записей из len(fields) элементов."""
+    step = len(fields)
+    for i in range(0, len(values), step):
+        yield values[i:i + step]
+
+
+class Snapshot:
+    """Снимок состояния игры.
+
+    :param sections: Словарь имя раздела -> последовательность чисел (array
+        или memoryview)
+    """
+
+    def __init__(self, sections):
+        self.sections = sections
+        # Буфер, на который ссылаются разделы (например, mmap файла)
+        self.buffer = None
+
+    def __getitem__(self, name):
+        return self.sections[name]
+
+    def get_game_info(self):
+        """Поля раздела GAME в виде словаря."""
+        return dict(zip(GAME_FIELDS, self[b'GAME']))
+
+    @classmethod
+    def from_game(cls, game):
+        """Снимок текущего состояния игры."""
+        sections = {name: array(typecode)
+                    for name, typecode in SECTIONS.items()}
+        snake_container = game.snake_container
+        food_container = game.food_container
+        params = game.params
+        sections[b'GAME'].extend((
+            game.seed, game.tick, params['with_player'],
+            -1 if params['bots_count'] is None else params['bots_count'],
+            params['food_count'], params['width'], params['height'],
+            snake_container.main_snake_id or 0, snake_container.last_id,
+            food_container.last_id, food_container.insert_version,
+        ))
+
+        version, state, gauss_next = game.rng.getstate()
+        sections[b'RAND'].append(version)
+        sections[b'RAND'].extend(state)
+        if gauss_next is not None:
+            sections[b'RNDG'].append(gauss_next)
+
+        for snake in snake_container.objects.values():
+            is_bot = isinstance(snake, BotSnake)
+            food = snake.current_food if is_bot else None
+            sections[b'SNKI'].extend((
+                snake.id, is_bot, snake.birth_tick, snake.length,
+                *snake.color[:3], TURNING_CODES[snake.turning_direction],
+                snake.is_boost_enabled, is_bot and snake.food_expired,
+                food.id if food else 0,
+                snake.current_food_generation if food else 0,
+            ))
+            sections[b'SNKF'].extend(
+                (snake.angle, snake.current_speed, snake.radius))
+            sections[b'SNKX'].extend(snake.xs)
+            sections[b'SNKY'].extend(snake.ys)
+
+        for food in food_container.objects.values():
+            sections[b'FODI'].extend(
+                (food.id, food.generation, *food.color[:3]))
+            sections[b'FODF'].extend((food.x, food.y, food.radius))
+        sections[b'SFRE'].extend(snake_container.free_ids)
+        sections[b'FFRE'].extend(food_container.free_ids)
+
+        scheduler = game.scheduler
+        for tick, _, key in sorted(
+                item for item in scheduler.heap
+                if scheduler.tokens.get(item[2]) == item[1]):
+            sections[b'SCHD'].extend((key, tick))
+
+        causes = DeathCauseEnum.values
+        for death in game.deaths:
+            sections[b'DTHS'].extend((
+                death.id, death.birth_tick, death.tick,
+                causes.index(death.cause) if death.cause in causes else -1,
+                death.length,
+            ))
+
+        for bot_id, (x, y, version, radius, candidates) in (
+                game.targeting.candidates.items()):
+            sections[b'TGTI'].extend((bot_id, version, len(candidates)))
+            sections[b'TGTF'].extend((x, y, radius))
+            for food in candidates:
+                sections[b'TGTC'].extend((food.id, food.generation))
+        return cls(sections)
+
+    def create_game(self):
+        """Создание игры из снимка."""
+        info = self.get_game_info()
+        bots_count = info['bots_count']
+        # Игра без змей и еды, состояние которой затем заменяется
+        game = GameLogic(with_player=False, bots_count=0, food_count=0,
+                         width=info['width'], height=info['height'],
+                         seed=info['seed'])
+        game.params.update(
+            with_player=bool(info['with_player']),
+            bots_count=None if bots_count < 0 else bots_count,
+            food_count=info['food_count'])
+        game.tick = game.scheduler.tick = info['tick']
+
+        rand = self[b'RAND']
+        gauss = self[b'RNDG']
+        game.rng.setstate((rand[0], tuple(rand[1:]),
+                           gauss[0] if len(gauss) else None))
+
+        food_container = game.food_container
+        for (food_id, generation, *color), (x, y, radius) in zip(
+                iter_rows(self[b'FODI'], FOOD_INT_FIELDS),
+                iter_rows(self[b'FODF'], FOOD_FLOAT_FIELDS)):
+            food = Food(food_id, pos=(x, y), color=tuple(color), radius=radius)
+            food_container.add_obj(food, force=True)
+            food.generation = generation
+        food_container.last_id = info['food_last_id']
+        food_container.free_ids = list(self[b'FFRE'])
+        food_container.insert_version = info['food_insert_version']
+        food_objects = food_container.objects
+
+        def get_food(food_id, generation):
+            food = food_objects.get(food_id)
+            return food if food and food.generation == generation else None
+
+        self.restore_snakes(game, get_food)
+        snake_container = game.snake_container
+        snake_container.last_id = info['snakes_last_id']
+        snake_container.free_ids = list(self[b'SFRE'])
+        snake_container.main_snake_id = info['main_snake_id'] or None
+        game.snake = (snake_container.main_snake
+                      if snake_container.main_snake_id else None)
+
+        for key, tick in iter_rows(self[b'SCHD'], SCHEDULE_FIELDS):
+            game.scheduler.schedule_at(key, tick)
+
+        causes = DeathCauseEnum.values
+        game.deaths = [
+            SnakeDeath(snake_id, birth_tick, tick,
+                       causes[cause] if cause >= 0 else None, length)
+            for snake_id, birth_tick, tick, cause, length in iter_rows(
+                self[b'DTHS'], DEATH_FIELDS)
+        ]
+
+        candidates = iter_rows(self[b'TGTC'], CANDIDATE_FIELDS)
+        for (bot_id, version, count), (x, y, radius) in zip(
+                iter_rows(self[b'TGTI'], TARGET_INT_FIELDS),
+                iter_rows(self[b'TGTF'], TARGET_FLOAT_FIELDS)):
+            # Съеденная еда среди кандидатов не учитывается, поэтому ее
+            # можно не восстанавливать
+            foods = [get_food(*next(candidates)) for _ in range(count)]
+            game.targeting.candidates[bot_id] = (
+                x, y, version, radius, [food for food in foods if food])
+        return game
+
+    def restore_snakes(self, game, get_food):
+        """Восстановление змей игры."""
+        snake_container = game.snake_container
+        xs, ys = self[b'SNKX'], self[b'SNKY']
+        start = 0
+        for row, (angle, current_speed, radius) in zip(
+                iter_rows(self[b'SNKI'], SNAKE_INT_FIELDS),
+                iter_rows(self[b'SNKF'], SNAKE_FLOAT_FIELDS)):
+            fields = dict(zip(SNAKE_INT_FIELDS, row))
+            end = start + fields['length']
+            kwargs = dict(
+                start_pos=(xs[start], ys[start]), angle=angle,
+                color=(fields['r'], fields['g'], fields['b']),
+                birth_tick=fields['birth_tick'])
+            if fields['is_bot']:
+                snake = BotSnake(
+                    fields['id'], game.food_container,
+                    game_rect=game.game_rect, rng=game.rng,
+                    scheduler=game.scheduler, targeting=game.targeting,
+                    **kwargs)
+                snake.food_expired = bool(fields['food_expired'])
+                if fields['food_id']:
+                    snake.current_food = get_food(
+                        fields['food_id'], fields['food_generation'])
+                    snake.current_food_generation = fields['food_generation']
+            else:
+                snake = Snake(fields['id'], **kwargs)
+            snake.xs = array('d', xs[start:end])
+            snake.ys = array('d', ys[start:end])
+            snake.update_bounding_box()
+            snake.radius = radius
+            snake.current_speed = current_speed
+            snake.turning_direction = CODES_TURNING[fields['turning']]
+            snake.is_boost_enabled = bool(fields['boost'])
+            snake_container.add_obj(snake)
+            start = end
+
+    def to_buffers(self):
+        """Снимок в виде списка буферов (заголовок и данные разделов без
+        копирования), например, для file.writelines или socket.sendmsg."""
+        names = list(self.sections)
+        offset = HEADER.size + SECTION.size * len(names)
+        table, data = [], []
+        for name in names:
+            values = self.sections[name]
+            if not isinstance(values, array) or sys.byteorder != 'little':
+                values = array(SECTIONS[name], values)
+                if sys.byteorder != 'little':
+                    values.byteswap()
+            padding = -offset % ALIGNMENT
+            if padding:
+                data.append(bytes(padding))
+                offset += padding
+            table.append(SECTION.pack(
+                name, SECTIONS[name].encode(), offset, len(values)))
+            data.append(memoryview(values).cast('B'))
+            offset += len(values) * values.itemsize
+        header = HEADER.pack(MAGIC, VERSION, len(names)) + b''.join(table)
+        return [header] + data
+
+    def to_bytes(self):
+        return b''.join(self.to_buffers())
+
+    @classmethod
+    def from_bytes(cls, buffer):
+        """Чтение снимка из bytes, memoryview или mmap.
+
+        Разделы ссылаются на buffer, пока снимок используется.
+        """
+        view = memoryview(buffer).cast('B')
+        if len(view) < HEADER.size:
+            raise SnapshotError('Снимок слишком короткий')
+        magic, version, count = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise SnapshotError('Это не снимок игры')
+        if version > VERSION:
+            raise SnapshotError(f'Неподдерживаемая версия снимка: {version}')
+
+        sections = {}
+        for i in range(count):
+            name, typecode, offset, length = SECTION.unpack_from(
+                view, HEADER.size + i * SECTION.size)
+            typecode = typecode.decode()
+            if SECTIONS.get(name) != typecode:
+                continue
+            size = struct.calcsize(typecode)
+            if offset + length * size > len(view):
+                raise SnapshotError(f'Раздел {name!r} выходит за конец снимка')
+            values = view[offset:offset + length * size].cast(typecode)
+            if sys.byteorder != 'little':
+                values = array(typecode, values)
+                values.byteswap()
+            sections[name] = values
+        missing = SECTIONS.keys() - sections.keys()
+        if missing:
+            raise SnapshotError(f'Нет разделов: {sorted(missing)}')
+        snapshot = cls(sections)
+        snapshot.buffer = buffer
+        return snapshot
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.writelines(self.to_buffers())
+
+    @classmethod
+    def load(cls, path, use_mmap=True):
+        """Чтение снимка из файла (по умолчанию - через mmap, без чтения
+        файла целиком)."""
+        with open(path, 'rb') as f:
+            if not use_mmap:
+                return cls.from_bytes(f.read())
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_bytes(buffer)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='файл снимка')
+    args = parser.parse_args(argv)
+
+    snapshot = Snapshot.load(args.path)
+    result = snapshot.get_game_info()
+    result['snakes'] = len(snapshot[b'SNKI']) // len(SNAKE_INT_FIELDS)
+    result['segments'] = len(snapshot[b'SNKX'])
+    result['food'] = len(snapshot[b'FODI']) // len(FOOD_INT_FIELDS)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
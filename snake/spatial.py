@@ -0,0 +1,195 @@
+import heapq
+from collections import defaultdict
+
+
+class SpatialHashGrid:
+    """Равномерная сетка для быстрого поиска объектов по координатам.
+
+    Каждый элемент хранится по ключу в ячейке, в которую попадает его точка.
+    """
+
+    def __init__(self, cell_size=50):
+        self.cell_size = cell_size
+        # Ячейка -> {ключ: (x, y, объект)}
+        self.cells = defaultdict(dict)
+        # Ключ -> ячейка
+        self.keys_cells = {}
+
+    def __len__(self):
+        return len(self.keys_cells)
+
+    def get_cell(self, x, y):
+        """Получение ячейки, в которую попадает точка."""
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, key, x, y, obj):
+        """Добавление (или перемещение) элемента."""
+        if key in self.keys_cells:
+            self.remove(key)
+        cell = self.get_cell(x, y)
+        self.cells[cell][key] = (x, y, obj)
+        self.keys_cells[key] = cell
+
+    def remove(self, key):
+        """Удаление элемента по ключу."""
+        cell = self.keys_cells.pop(key, None)
+        if cell is None:
+            return
+        items = self.cells[cell]
+        items.pop(key, None)
+        if not items:
+            del self.cells[cell]
+
+    def clear(self):
+        """Удаление всех элементов."""
+        self.cells.clear()
+        self.keys_cells.clear()
+
+    def iter_rect(self, left, top, right, bottom):
+        """Перебор элементов (x, y, объект) из ячеек, пересекающих
+        прямоугольник."""
+        cell_size = self.cell_size
+        cells = self.cells
+        top_cell, bottom_cell = int(top // cell_size), int(bottom // cell_size)
+        for cx in range(int(left // cell_size), int(right // cell_size) + 1):
+            for cy in range(top_cell, bottom_cell + 1):
+                items = cells.get((cx, cy))
+                if items:
+                    yield from items.values()
+
+    def query_radius(self, x, y, radius):
+        """Объекты на расстоянии не больше radius от точки."""
+        sqr_radius = radius * radius
+        return [
+            obj for px, py, obj in self.iter_rect(
+                x - radius, y - radius, x + radius, y + radius)
+            if (px - x) ** 2 + (py - y) ** 2 <= sqr_radius
+        ]
+
+    def get_ring_cells(self, cx, cy, k):
+        """Ячейки кольца на расстоянии k ячеек от центральной."""
+        if not k:
+            return [(cx, cy)]
+        ring = []
+        for dx in range(-k, k + 1):
+            ring.append((cx + dx, cy - k))
+            ring.append((cx + dx, cy + k))
+        for dy in range(-k + 1, k):
+            ring.append((cx - k, cy + dy))
+            ring.append((cx + k, cy + dy))
+        return ring
+
+    def iter_rings(self, x, y):
+        """Перебор колец ячеек по мере удаления от точки.
+
+        Возвращает пары (нижняя граница расстояния от точки до элементов
+        кольца, список элементов кольца). Перебор заканчивается, когда
+        просмотрены все элементы сетки.
+        """
+        cell_size = self.cell_size
+        cx, cy = self.get_cell(x, y)
+        cells = self.cells
+        left_count = len(self.keys_cells)
+        k = 0
+        while left_count > 0:
+            if k:
+                # Расстояние до границы квадрата из предыдущих колец
+                bound = min(
+                    x - (cx - k + 1) * cell_size, (cx + k) * cell_size - x,
+                    y - (cy - k + 1) * cell_size, (cy + k) * cell_size - y,
+                )
+            else:
+                bound = 0
+            ring_items = []
+            for cell in self.get_ring_cells(cx, cy, k):
+                items = cells.get(cell)
+                if items:
+                    ring_items.extend(items.values())
+            left_count -= len(ring_items)
+            yield bound, ring_items
+            k += 1
+
+    def k_nearest(self, x, y, count):
+        """Список из count ближайших к точке объектов (по возрастанию
+        расстояния)."""
+        # Куча из count лучших кандидатов: (-расстояние, порядковый номер, obj)
+        found = []
+        index = 0
+        for bound, items in self.iter_rings(x, y):
+            if len(found) >= count and -found[0][0] <= bound:
+                break
+            for px, py, obj in items:
+                item = (-((px - x) ** 2 + (py - y) ** 2) ** 0.5, index, obj)
+                index += 1
+                if len(found) < count:
+                    heapq.heappush(found, item)
+                elif item > found[0]:
+                    heapq.heapreplace(found, item)
+        return [obj for _, _, obj in sorted(found, reverse=True)]
+
+    def find_min(self, x, y, key):
+        """Поиск объекта с минимальным значением key(obj).
+
+        Значение key(obj) не должно быть меньше расстояния от точки до объекта:
+        тогда поиск останавливается, как только очередное кольцо ячеек
+        оказывается дальше лучшего найденного значения.
+        """
+        best = best_value = None
+        for bound, items in self.iter_rings(x, y):
+            if best is not None and bound >= best_value:
+                break
+            for _, _, obj in items:
+                value = key(obj)
+                if best is None or value < best_value:
+                    best, best_value = obj, value
+        return best
+
+
+class RectGrid:
+    """Равномерная сетка прямоугольников для проверки попадания точек.
+
+    Прямоугольник добавляется во все ячейки, которые он пересекает.
+    """
+
+    def __init__(self, cell_size=100):
+        self.cell_size = cell_size
+        # Ячейка -> [(прямоугольник, владелец)]
+        self.cells = defaultdict(list)
+
+    def insert(self, rect, owner=None):
+        """Добавление прямоугольника pygame.Rect."""
+        cell_size = self.cell_size
+        # Запас в 1 пиксель: pygame отбрасывает дробную часть координат точки
+        top_cell = (rect.top - 1) // cell_size
+        bottom_cell = rect.bottom // cell_size
+        item = (rect, owner)
+        for cx in range((rect.left - 1) // cell_size,
+                        rect.right // cell_size + 1):
+            for cy in range(top_cell, bottom_cell + 1):
+                self.cells[(cx, cy)].append(item)
+
+    def collidepoint(self, x, y, exclude_owner=None):
+        """Проверка, что точка лежит в прямоугольнике не исключенного
+        владельца."""
+        cell_size = self.cell_size
+        items = self.cells.get((int(x // cell_size), int(y // cell_size)))
+        if not items:
+            return False
+        return any(
+            owner is not exclude_owner and rect.collidepoint(x, y)
+            for rect, owner in items
+        )
+
+    def get_owners(self, rect):
+        """Владельцы прямоугольников, пересекающихся с rect (без повторов,
+        в порядке добавления в ячейки)."""
+        cell_size = self.cell_size
+        owners = {}
+        top_cell = rect.top // cell_size
+        bottom_cell = rect.bottom // cell_size
+        for cx in range(rect.left // cell_size, rect.right // cell_size + 1):
+            for cy in range(top_cell, bottom_cell + 1):
+                for item_rect, owner in self.cells.get((cx, cy), ()):
+                    if owner not in owners and item_rect.colliderect(rect):
+                        owners[owner] = None
+        return list(owners)
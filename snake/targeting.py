@@ -0,0 +1,142 @@
+import math
+
+from helpers import calculate_angle_to_point, get_points_distance
+
+
+class FoodTargeting:
+    """Инкрементальный выбор еды для ботов.
+
+    Еда выбирается полным поиском по кольцам ячеек сетки (как в
+    FoodContainer.get_nearest_food), но поиск продолжается, пока кольца не
+    окажутся дальше лучшей оценки на reuse_margin. Вся просмотренная еда
+    запоминается как кандидаты бота, а граница просмотра - как radius:
+    любая еда вне кандидатов находится от места выбора не ближе radius,
+    т.е. от бота, сместившегося на shift, - не ближе radius - shift.
+
+    Оценка еды (FoodContainer._get_food_priority_coef) не меньше расстояния
+    до неё, поэтому при следующем выборе кандидаты перебираются по
+    возрастанию расстояния, а угол считается, только пока расстояние меньше
+    лучшей оценки. Если лучшая оценка не больше radius - shift, найденная
+    еда совпадает с результатом полного поиска, иначе выполняется новый
+    поиск.
+
+    Новая еда нарушает это условие, только если она ближе radius к месту
+    выбора, поэтому при добавлении она дописывается в кандидаты тех ботов,
+    в чей радиус попала; кандидаты остальных ботов не меняются.
+    """
+    # Запас радиуса кандидатов сверх лучшей оценки (примерное смещение бота
+    # между выборами еды)
+    reuse_margin = 50
+
+    def __init__(self, food_container):
+        self.food_container = food_container
+        # id бота -> (x, y, версия добавления еды, радиус, кандидаты)
+        self.candidates = {}
+        # Количество выборов по прежним кандидатам и полным поиском
+        self.reused = 0
+        self.refreshed = 0
+        food_container.listeners.append(self.handle_food_change)
+
+    def handle_food_change(self, food):
+        """Добавление новой еды в кандидаты ботов, в чей радиус она попала.
+
+        Вызывается контейнером еды при добавлении и удалении еды; удаленная
+        еда (ещё находящаяся в контейнере) отбрасывается при выборе.
+        """
+        if self.food_container.objects.get(food.id) is food:
+            return
+        for x, y, _, radius, candidates in self.candidates.values():
+            if math.hypot(food.x - x, food.y - y) < radius:
+                candidates.append(food)
+
+    def forget(self, bot_id):
+        """Удаление кандидатов бота (например, после гибели)."""
+        self.candidates.pop(bot_id, None)
+
+    def get_priority(self, x, y, current_angle, food, distance):
+        """Оценка еды, как в FoodContainer._get_food_priority_coef, но с уже
+        вычисленным расстоянием до неё."""
+        angle_to_rotate = calculate_angle_to_point(
+            x, y, food.x, food.y, current_angle)
+        return (abs(angle_to_rotate) *
+                self.food_container.ANGLE_TO_DISTANCE_COEF + distance)
+
+    def search(self, point, current_angle, values):
+        """Полный поиск лучшей еды с запоминанием кандидатов.
+
+        :param values: Уже вычисленные оценки еды {еда: оценка}
+        :return: (еда, запись кандидатов)
+        """
+        food_container = self.food_container
+        x, y = point
+        best = best_value = None
+        candidates = []
+        radius = math.inf
+        for bound, items in food_container.grid.iter_rings(x, y):
+            if best is not None and bound >= best_value + self.reuse_margin:
+                radius = bound
+                break
+            # Оценка нужна, только пока кольцо ближе лучшей оценки
+            is_needed = best is None or bound < best_value
+            for fx, fy, food in items:
+                candidates.append(food)
+                if not is_needed:
+                    continue
+                value = values.get(food)
+                if value is None:
+                    value = self.get_priority(
+                        x, y, current_angle, food,
+                        get_points_distance(x, y, fx, fy))
+                if best is None or value < best_value:
+                    best, best_value = food, value
+        entry = (x, y, food_container.insert_version, radius, candidates)
+        return best, entry
+
+    def find_best(self, point, current_angle, entry, values):
+        """Лучшая еда среди кандидатов, если она лучше всей остальной.
+
+        :param values: Словарь, в который записываются вычисленные оценки
+        """
+        cx, cy, _, radius, candidates = entry
+        x, y = point
+        # Еда вне кандидатов не ближе limit, поэтому подходит только
+        # оценка не больше limit, а она бывает лишь у еды ближе limit
+        limit = radius - get_points_distance(x, y, cx, cy)
+        if limit <= 0:
+            return None
+        objects = self.food_container.objects
+        by_distance = []
+        for food in candidates:
+            distance = get_points_distance(x, y, food.x, food.y)
+            # Съеденная еда из кандидатов исключается
+            if distance < limit and objects.get(food.id) is food:
+                by_distance.append((distance, food.id, food))
+        by_distance.sort()
+        best = best_value = None
+        for distance, _, food in by_distance:
+            if best is not None and distance >= best_value:
+                break
+            value = values[food] = self.get_priority(
+                x, y, current_angle, food, distance)
+            if best is None or value < best_value:
+                best, best_value = food, value
+        if best is not None and best_value <= limit:
+            return best
+        return None
+
+    def get_target(self, bot):
+        """Еда с наименьшей оценкой для бота (как get_nearest_food)."""
+        if not self.food_container.objects:
+            return None
+        point = bot.head_xy
+        values = {}
+        entry = self.candidates.get(bot.id)
+        if entry is not None:
+            best = self.find_best(point, bot.angle, entry, values)
+            if best is not None:
+                self.reused += 1
+                return best
+
+        best, self.candidates[bot.id] = self.search(point, bot.angle, values)
+        self.refreshed += 1
+        return best
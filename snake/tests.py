@@ -1,7 +1,40 @@
+import asyncio
+import os
+import random
+import sys
+import tempfile
 import unittest
 from functools import partial
+from unittest import mock
 
-from snake.helpers import get_angle_of_points, calculate_angle_to_point
+import pygame
+
+from snake.ai import BotPolicy, FoodOnlyPolicy
+from snake.benchmark import DEFAULT_CONFIG, create_game, run_benchmark
+from snake.env import SnakeEnv, VecEnv
+from snake.helpers import (
+    DE, DeathCauseEnum, get_angle_of_points, calculate_angle_to_point,
+    get_points_distance, get_new_point_pos,
+)
+from snake.logics import (
+    BotSnake, Controller, FoodContainer, GameLogic, GameState, Snake,
+)
+from snake.loop import FixedTimestepLoop
+from snake.profiling import PhaseProfiler
+from snake.render import (
+    GameRenderer, MiniMapRenderer, SpriteCache, TiledSurface,
+)
+from snake.replay import Replay, ReplayRecorder, play
+from snake.runner import (
+    get_jobs, get_sweep_points, overridden, run_match, run_matches,
+)
+from snake.scheduler import TickScheduler
+from snake.server import (
+    BotClient, Client, ClientView, ClientWorld, GameServer,
+)
+from snake import snapshot
+from snake.snapshot import Snapshot
+from snake.targeting import FoodTargeting
 
 
 class BaseAngleTest(unittest.TestCase):
@@ -40,5 +73,890 @@ class TestCalculateAngleToPoint(BaseAngleTest):
     correct_values = (45, 90, 135, 180, -135, -90, -45, 0)
 
 
+class TestGameLogic(unittest.TestCase):
+    """Проверка игры без окна."""
+
+    def test_step(self):
+        game = GameLogic(bots_count=3, seed=1)
+        observed_ticks, observed_inputs = [], []
+        game.add_observer(lambda g: observed_ticks.append(g.tick))
+        game.add_input_observer(
+            lambda tick, inputs: observed_inputs.append((tick, inputs)))
+        inputs = {'turning': DE.LEFT}
+        # Такт не создает окна и поверхностей pygame
+        with mock.patch('pygame.display.set_mode',
+                        side_effect=AssertionError), \
+                mock.patch('pygame.Surface', side_effect=AssertionError):
+            states = [game.step(inputs if tick == 0 else None)
+                      for tick in range(3)]
+        self.assertTrue(all(isinstance(state, GameState) for state in states))
+        self.assertEqual([state.tick for state in states], [1, 2, 3])
+        self.assertEqual(observed_ticks, [1, 2, 3])
+        self.assertEqual(observed_inputs, [(0, inputs), (1, None), (2, None)])
+        self.assertEqual(game.snake.turning_direction, DE.LEFT)
+        self.assertEqual(len(states[-1].snakes), 4)
+
+
+class TestFoodContainerGrid(unittest.TestCase):
+    """Проверка поиска еды по сетке в сравнении с полным перебором."""
+
+    def setUp(self):
+        random.seed(42)
+        self.container = FoodContainer(count=300)
+        for food_id in list(self.container.objects)[::3]:
+            self.container.delete_by_id(food_id)
+        self.points = [
+            (random.uniform(-100, 1600), random.uniform(-100, 1600))
+            for _ in range(50)
+        ]
+
+    def test_nearest_food(self):
+        for point in self.points:
+            for angle in (0, 90, 200):
+                key_func = partial(self.container._get_food_priority_coef,
+                                   point, angle)
+                expected = min(self.container.objects.values(), key=key_func)
+                self.assertIs(
+                    self.container.get_nearest_food(point, angle), expected)
+
+    def test_food_in_radius(self):
+        for point in self.points:
+            expected = {
+                food.id for food in self.container.objects.values()
+                if (food.x - point[0]) ** 2 + (food.y - point[1]) ** 2 <=
+                100 ** 2
+            }
+            found = self.container.get_food_in_radius(point, 100)
+            self.assertEqual({food.id for food in found}, expected)
+
+    def test_k_nearest_food(self):
+        for point in self.points:
+            expected = sorted(
+                self.container.objects.values(),
+                key=lambda f: (f.x - point[0]) ** 2 + (f.y - point[1]) ** 2,
+            )[:7]
+            self.assertEqual(
+                self.container.get_k_nearest_food(point, 7), expected)
+
+
+class TestFoodPool(unittest.TestCase):
+    """Проверка повторного использования еды и ее id."""
+
+    def test_reuse(self):
+        container = FoodContainer(count=10)
+        food = container.objects[3]
+        generation = food.generation
+        container.delete_by_id(3)
+        self.assertFalse(container.is_actual(food, generation))
+
+        new_food = container.add_new_obj(pos=(10, 20))
+        # Освободившиеся id и объекты используются повторно
+        self.assertIs(new_food, food)
+        self.assertEqual((new_food.id, new_food.x, new_food.y), (3, 10, 20))
+        self.assertFalse(container.is_actual(food, generation))
+        self.assertTrue(container.is_actual(food, food.generation))
+        self.assertEqual(len(set(container.objects)), 10)
+        self.assertEqual(container.get_pool_stats(), {
+            'created': 10, 'reused': 1, 'released': 1, 'free': 0})
+
+
+class TestFoodTargeting(unittest.TestCase):
+    """Проверка выбора еды по кандидатам в сравнении с полным поиском."""
+
+    def test_same_priority(self):
+        random.seed(8)
+        container = FoodContainer(count=300)
+        targeting = FoodTargeting(container)
+        snake = Snake(1, start_pos=(700, 700), angle=30)
+        for tick in range(400):
+            snake.change_angle(random.choice((-10, 0, 0, 10)))
+            snake.move()
+            if tick % 7 == 0:
+                food = targeting.get_target(snake)
+                expected = container.get_nearest_food(snake.head_xy,
+                                                      snake.angle)
+                # При равной оценке может быть выбрана другая еда
+                self.assertEqual(
+                    container._get_food_priority_coef(
+                        snake.head_xy, snake.angle, food),
+                    container._get_food_priority_coef(
+                        snake.head_xy, snake.angle, expected),
+                    msg=f'tick={tick}')
+            if tick % 20 == 0:
+                container.delete_by_id(food.id)
+            if tick % 60 == 0:
+                container.add_new_obj()
+        self.assertGreater(targeting.reused, 0)
+
+    def test_reuse_while_food_respawns(self):
+        random.seed(3)
+        container = FoodContainer(count=300)
+        targeting = FoodTargeting(container)
+        snake = Snake(1, start_pos=(700, 700), angle=30)
+        targeting.get_target(snake)
+        x, y, _, radius, _ = targeting.candidates[snake.id]
+        # Еда пропадает и появляется вне радиуса кандидатов
+        for i in range(20):
+            container.delete_by_id(container.get_next_food().id)
+            container.add_new_obj(force=True, pos=(x + radius + 10 * i, y))
+            targeting.get_target(snake)
+        self.assertEqual(len(container.objects), 300)
+        self.assertEqual((targeting.reused, targeting.refreshed), (20, 1))
+
+        # Еда перед ботом попадает в кандидаты без нового поиска
+        pos = get_new_point_pos(*snake.head_xy, snake.angle, 20)
+        food = container.add_new_obj(force=True, pos=pos)
+        self.assertIs(targeting.get_target(snake), food)
+        self.assertIs(
+            container.get_nearest_food(snake.head_xy, snake.angle), food)
+        self.assertEqual((targeting.reused, targeting.refreshed), (21, 1))
+
+
+class TestCollisionGrid(unittest.TestCase):
+    """Проверка поиска столкновений по сетке в сравнении с полным перебором."""
+
+    def test_find_collision(self):
+        game = GameLogic(with_player=False, seed=7)
+        rng = random.Random(7)
+        for _ in range(40):
+            game.snake_container.create_bot_snake(
+                start_pos=(rng.randint(100, 400), rng.randint(100, 400)),
+                angle=rng.randint(0, 359),
+            )
+        for snake in game.get_snakes():
+            snake.add_tail(rng.randint(0, 20))
+            for _ in range(rng.randint(0, 10)):
+                snake.move()
+
+        snakes = game.get_snakes()
+        grid = game.build_collision_grid(snakes)
+        max_radius = max(snake.radius for snake in snakes)
+        collisions_count = 0
+        for snake in snakes:
+            expected = None
+            for other_snake in snakes:
+                index = snake.find_collision_with_other_snake(
+                    other_snake, exclude_self=True)
+                if index is not None:
+                    expected = (other_snake, index)
+                    collisions_count += 1
+                    break
+            self.assertEqual(
+                game.find_collision(snake, grid, max_radius), expected)
+        self.assertTrue(collisions_count)
+
+
+class TestSnakesRectanglesCache(unittest.TestCase):
+    """Проверка построения прямоугольников змей один раз за такт."""
+
+    def test_cache_misses(self):
+        game = GameLogic(with_player=False, seed=3)
+        container = game.snake_container
+        ticks = 20
+        for _ in range(ticks):
+            game.step()
+        self.assertEqual(container.rectangles_cache_misses,
+                         ticks * len(game.get_snakes()))
+
+
+class TestSnakeArrays(unittest.TestCase):
+    """Проверка хранения тела змеи в массивах координат."""
+
+    def test_circles_are_views(self):
+        snake = Snake(1, start_pos=(100, 100))
+        snake.add_tail(5)
+        circles = snake.circles
+        self.assertEqual([(c.x, c.y) for c in circles], list(snake.points))
+        # Запись через круг меняет массивы и ограничивающий прямоугольник
+        circles[-1].x = 500
+        self.assertEqual(snake.xs[-1], 500)
+        self.assertEqual(snake.get_bounding_box().right, 500)
+        snake.move()
+        self.assertEqual(circles[0].x, snake.xs[0])
+
+    def test_shared_radius(self):
+        snake = Snake(1)
+        snake.add_tail(20)
+        circles = snake.circles
+        # Радиус хранится один раз в змее, а не в каждом элементе
+        snake.update_radius(17)
+        self.assertTrue(all(circle.radius == 17 for circle in circles))
+        # Элемент хранит только ссылку на змею и номер
+        self.assertFalse(hasattr(circles[0], '__dict__'))
+
+
+def move_with_angles(snake):
+    """Движение змеи через углы между элементами (прежняя реализация)."""
+    xs, ys = snake.xs, snake.ys
+    xs[0], ys[0] = get_new_point_pos(
+        xs[0], ys[0], snake.angle, snake.current_speed)
+    prev_x, prev_y = xs[0], ys[0]
+    for i in range(1, len(xs)):
+        distance = get_points_distance(xs[i], ys[i], prev_x, prev_y)
+        if distance > 0.5 * snake.radius:
+            angle = get_angle_of_points(prev_x, prev_y, xs[i], ys[i])
+            xs[i], ys[i] = get_new_point_pos(
+                prev_x, prev_y, angle, snake.double_r_coef)
+        prev_x, prev_y = xs[i], ys[i]
+
+
+class TestSnakeMove(unittest.TestCase):
+    """Сравнение траекторий змеи с прежней реализацией движения."""
+
+    ticks = 500
+
+    def test_trajectory(self):
+        random.seed(5)
+        snake = Snake(1, start_pos=(700, 700), angle=30)
+        expected_snake = Snake(2, start_pos=(700, 700), angle=30)
+        for tick in range(self.ticks):
+            delta_angle = random.choice((-10, -3, 0, 0, 0, 7, 10))
+            food_count = int(tick % 25 == 0)
+            for s, move in ((snake, snake.move),
+                            (expected_snake, partial(move_with_angles,
+                                                     expected_snake))):
+                s.change_angle(delta_angle)
+                move()
+                if food_count:
+                    s.add_tail(food_count)
+
+            for coords, expected_coords in (
+                    (snake.xs, expected_snake.xs),
+                    (snake.ys, expected_snake.ys)):
+                for value, expected_value in zip(coords, expected_coords):
+                    self.assertAlmostEqual(value, expected_value, places=6,
+                                           msg=f'tick={tick}')
+
+
+class TestBotsAI(unittest.TestCase):
+    """Проверка пакетного выбора направления ботов."""
+
+    class OneByOnePolicy(BotPolicy):
+        """Проверка пробных точек бота перебором прямоугольников всех змей."""
+
+        def __init__(self, snake_container):
+            self.snake_container = snake_container
+
+        def get_actions(self, bots, foods_counts, observations):
+            is_collide = self.snake_container.is_collide_snakes_rectangles
+            actions = []
+            for bot, food_count in zip(bots, foods_counts):
+                probes = bot.get_probes()
+                normal_angles = {
+                    delta for delta, pos in probes
+                    if not is_collide(pos, exclude_snake=bot)
+                    and bot.game_rect.collidepoint(*pos)
+                }
+                turn = bot.get_obstacles_turn(probes, normal_angles)
+                if turn is None:
+                    turn = bot.get_food_turn(food_count)
+                actions.append((turn, None))
+            return actions
+
+    def run_game(self, one_by_one=False):
+        game = GameLogic(with_player=False, bots_count=12, seed=11)
+        if one_by_one:
+            policy = self.OneByOnePolicy(game.snake_container)
+            game.get_bot_policy = lambda bot: policy
+        return [game.step() for _ in range(200)]
+
+    def test_same_decisions(self):
+        states = self.run_game()
+        expected_states = self.run_game(one_by_one=True)
+        for state, expected_state in zip(states, expected_states):
+            self.assertEqual(
+                [(s.head, s.angle, s.length) for s in state.snakes],
+                [(s.head, s.angle, s.length) for s in expected_state.snakes],
+                msg=f'tick={state.tick}')
+
+
+class TestBotPolicy(unittest.TestCase):
+    """Проверка подключаемых политик ботов."""
+
+    class BoostPolicy(BotPolicy):
+        """Движение к еде с ускорением."""
+
+        def __init__(self):
+            self.calls = []
+
+        def get_actions(self, bots, foods_counts, observations):
+            self.calls.append(list(bots))
+            return [(turn, True) for turn, _ in FoodOnlyPolicy().get_actions(
+                bots, foods_counts, observations)]
+
+    def test_batched_actions(self):
+        game = GameLogic(with_player=False, bots_count=6, seed=5)
+        policy = self.BoostPolicy()
+        bots = game.get_snakes()[:3]
+        for bot in bots:
+            bot.policy = policy
+        for _ in range(10):
+            game.step()
+        # Один вызов за такт со всеми ботами политики
+        self.assertEqual(len(policy.calls), 10)
+        self.assertTrue(all(call == bots for call in policy.calls))
+        for bot in bots:
+            self.assertGreater(bot.current_speed, bot.usual_speed)
+        for bot in game.get_snakes()[3:]:
+            self.assertLessEqual(bot.current_speed, bot.usual_speed)
+
+    def test_rays(self):
+        game = GameLogic(with_player=False, bots_count=3, seed=5)
+        game.step()
+        bots = game.get_snakes()
+        observations = game.get_bots_observations()
+        rays = observations.get_rays(bots, BotSnake.probe_angles)
+        self.assertEqual(len(rays), len(bots) * len(BotSnake.probe_angles))
+        self.assertTrue(all(0 <= ray <= 1 for ray in rays))
+
+
+class TestBoundaryCheck(unittest.TestCase):
+    """Проверка выхода за границы по крайним координатам змей."""
+
+    @staticmethod
+    def check_all_points(game):
+        for snake in game.get_snakes():
+            if not all(game.game_rect.collidepoint(*pos)
+                       for pos in snake.points):
+                game.snake_is_dead(snake, DeathCauseEnum.BORDER)
+
+    def run_game(self, all_points=False):
+        game = GameLogic(with_player=False, bots_count=15, seed=3,
+                         width=600, height=600)
+        if all_points:
+            game.check_snakes_in_game_rect = partial(
+                self.check_all_points, game)
+        for _ in range(300):
+            game.step()
+        return game.deaths
+
+    def test_same_deaths(self):
+        deaths = self.run_game()
+        self.assertIn(DeathCauseEnum.BORDER,
+                      [death.cause for death in deaths])
+        self.assertEqual(deaths, self.run_game(all_points=True))
+
+
+class TestSpriteCache(unittest.TestCase):
+    """Сравнение кругов из кэша с pygame.draw.circle."""
+
+    def test_same_pixels(self):
+        cache = SpriteCache(max_size=3)
+        for color in ((64, 255, 108), (255, 0, 255)):
+            for radius in (1, 5, 10.7, 25):
+                for center in ((20.3, 30.9), (-3.5, 10.2), (59.9, 0.4)):
+                    expected, result = pygame.Surface(
+                        (60, 60)), pygame.Surface((60, 60))
+                    pygame.draw.circle(expected, color, center, radius)
+                    cache.draw_circle(result, color, center, radius)
+                    self.assertEqual(
+                        pygame.image.tobytes(result, 'RGB'),
+                        pygame.image.tobytes(expected, 'RGB'),
+                        msg=f'{color}, {radius}, {center}')
+        self.assertEqual(len(cache.sprites), 3)
+        self.assertEqual(list(cache.sprites)[-1], ((255, 0, 255), 25))
+
+
+class TestViewportCulling(unittest.TestCase):
+    """Проверка отбора змей, попадающих в область просмотра."""
+
+    def test_visible_snakes(self):
+        game = GameLogic(with_player=False, bots_count=30, width=3000,
+                         height=3000, seed=4)
+        renderer = GameRenderer(pygame.Surface((1, 1)))
+        game.add_observer(renderer)
+        for _ in range(5):
+            game.step()
+        area = pygame.Rect(1000, 1000, 800, 800)
+        with mock.patch.object(renderer, 'get_snake_points',
+                               wraps=renderer.get_snake_points) as get_points:
+            visible = dict(
+                (snake, points) for snake, points in
+                renderer.get_visible_snakes(game, 0.5, area))
+        # Координаты интерполируются только у змей рядом с областью
+        self.assertEqual(get_points.call_count, len(visible))
+        self.assertTrue(visible)
+        self.assertLess(len(visible), len(game.get_snakes()))
+        for snake in game.get_snakes():
+            margin = snake.radius + snake.max_speed_with_boost
+            expected = [
+                (x, y) for x, y in renderer.get_snake_points(snake, 0.5)
+                if area.left - margin <= x <= area.right + margin
+                and area.top - margin <= y <= area.bottom + margin]
+            self.assertEqual(visible.get(snake, []), expected)
+
+
+class TestMiniMap(unittest.TestCase):
+    """Проверка кэширования мини карты."""
+
+    def test_refresh(self):
+        game = GameLogic(with_player=False, bots_count=1, seed=2)
+        mini_map = MiniMapRenderer(100, refresh_frames=3)
+        with mock.patch.object(mini_map, 'redraw',
+                               wraps=mini_map.redraw) as redraw:
+            changed = []
+            for _ in range(7):
+                mini_map.get_surface(game)
+                changed.append(mini_map.is_changed)
+        self.assertEqual(redraw.call_count, 3)
+        self.assertEqual(changed, [True, False, False] * 2 + [True])
+
+    def test_snake_drawn(self):
+        game = GameLogic(with_player=False, bots_count=1, food_count=0,
+                         seed=2)
+        snake = game.get_snakes()[0]
+        surface = MiniMapRenderer(100).get_surface(game)
+        scale = 100 / game.game_rect.width
+        x, y = (int(c * scale) for c in snake.head_xy)
+        colors = {tuple(surface.get_at((x + dx, y + dy)))[:3]
+                  for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+        self.assertIn(tuple(snake.color), colors)
+
+
+class TestTiledSurface(unittest.TestCase):
+    """Сравнение отрисовки по плиткам с отрисовкой на одной поверхности."""
+
+    def test_same_pixels(self):
+        game = GameLogic(seed=5)
+        renderer = GameRenderer(pygame.Surface(game.game_rect.size))
+        tiled_renderer = GameRenderer(TiledSurface(game.game_rect.size, 200))
+        game.add_observer(renderer)
+        game.add_observer(tiled_renderer)
+        for _ in range(150):
+            game.step()
+
+        for alpha in (0.3, 1):
+            offset_x, offset_y = renderer.get_offset(game, alpha)
+            viewport = pygame.Rect(-offset_x, -offset_y, 800, 800).clip(
+                game.game_rect)
+            renderer.draw(game, alpha, viewport)
+            tiled_renderer.draw(game, alpha, viewport)
+            expected, result = pygame.Surface((800, 800)), pygame.Surface(
+                (800, 800))
+            expected.blit(renderer.surface, (viewport.x + offset_x,
+                                             viewport.y + offset_y), viewport)
+            tiled_renderer.surface.blit_to(
+                result, viewport, (offset_x, offset_y))
+            self.assertEqual(pygame.image.tobytes(result, 'RGB'),
+                             pygame.image.tobytes(expected, 'RGB'))
+            # Созданы только плитки области просмотра
+            self.assertEqual(
+                set(tiled_renderer.surface.tiles),
+                set(tiled_renderer.surface.get_tile_keys(viewport)))
+
+
+class TestDirtyTiles(unittest.TestCase):
+    """Проверка перерисовки только изменившихся плиток."""
+
+    @mock.patch.object(BotSnake, 'draw_food_path', False)
+    def test_same_pixels(self):
+        game = GameLogic(with_player=False, bots_count=20, seed=5)
+        renderer = GameRenderer(pygame.Surface(game.game_rect.size))
+        tiled_renderer = GameRenderer(
+            TiledSurface(game.game_rect.size, 200), track_changes=True)
+        game.add_observer(renderer)
+        game.add_observer(tiled_renderer)
+        game.food_container.listeners.append(tiled_renderer.mark_food_dirty)
+
+        redrawn_count = tiles_count = 0
+        for tick in range(60):
+            game.step()
+            # Камера сдвигается раз в 10 тактов
+            viewport = pygame.Rect(
+                300 + tick // 10 * 30, 300, 800, 800).clip(game.game_rect)
+            for alpha in (0.5, 1):
+                renderer.draw(game, alpha, viewport)
+                redrawn = tiled_renderer.draw(game, alpha, viewport)
+                redrawn_count += len(redrawn)
+                tiles_count += len(
+                    tiled_renderer.surface.get_tile_keys(viewport))
+                expected, result = pygame.Surface(
+                    viewport.size), pygame.Surface(viewport.size)
+                expected.blit(renderer.surface, (0, 0), viewport)
+                tiled_renderer.surface.blit_to(
+                    result, viewport, (-viewport.x, -viewport.y))
+                self.assertEqual(pygame.image.tobytes(result, 'RGB'),
+                                 pygame.image.tobytes(expected, 'RGB'),
+                                 msg=f'tick={tick}, alpha={alpha}')
+        self.assertLess(redrawn_count, tiles_count)
+
+
+class TestDirtyRects(unittest.TestCase):
+    """Проверка вывода в окно только изменившихся областей."""
+
+    class Overlay:
+        """Полупрозрачная панель вместо замеров."""
+
+        def __init__(self):
+            self.surface = pygame.Surface((120, 60), pygame.SRCALPHA)
+            self.surface.fill((255, 255, 255, 100))
+
+        def draw(self, win):
+            return win.blit(self.surface, (win.get_width() - 120, 0))
+
+    @mock.patch('snake.logics.SHOW_MINI_MAP', False)
+    @mock.patch.object(BotSnake, 'draw_food_path', False)
+    def test_same_pixels(self):
+        controller = Controller(
+            pygame.Surface((800, 800)), profiling=False, dirty_rects=True,
+            bots_count=2, seed=3)
+        controller.profiler_overlay = overlay = self.Overlay()
+        expected = pygame.Surface(controller.win.get_size())
+        dirty_frames = 0
+        for tick in range(120):
+            controller.inputs = {
+                'turning': DE.LEFT if tick % 90 < 20 else None}
+            controller.step()
+            controller.render(0.5)
+            dirty_frames += controller.dirty_rects is not None
+            # Кадр, нарисованный целиком
+            offset_x, offset_y = controller.last_offset
+            viewport = pygame.Rect(
+                -offset_x, -offset_y, *expected.get_size()
+            ).clip(controller.game_surface.get_rect())
+            expected.fill(controller.default_color)
+            controller.game_surface.blit_to(
+                expected, viewport, controller.last_offset)
+            overlay.draw(expected)
+            self.assertEqual(pygame.image.tobytes(controller.win, 'RGB'),
+                             pygame.image.tobytes(expected, 'RGB'),
+                             msg=f'tick={tick}')
+        # Камера сдвигается, только когда голова покидает центр окна
+        self.assertGreater(dirty_frames, 100)
+
+
+class TestFixedTimestepLoop(unittest.TestCase):
+    """Проверка накопления времени и ограничения тактов за кадр."""
+
+    def test_advance(self):
+        loop = FixedTimestepLoop(tick_rate=10, max_catch_up_ticks=3)
+        self.assertEqual(loop.advance(0.05), 0)
+        self.assertAlmostEqual(loop.alpha, 0.5)
+        self.assertEqual(loop.advance(0.16), 2)
+        self.assertAlmostEqual(loop.alpha, 0.1)
+        # Отставание больше лимита отбрасывается
+        self.assertEqual(loop.advance(1.05), 3)
+        self.assertAlmostEqual(loop.alpha, 0.6)
+
+    def test_run_ticks(self):
+        times = iter([0, 0.25, 0.3])
+        loop = FixedTimestepLoop(tick_rate=10, max_catch_up_ticks=3,
+                                 timer=lambda: next(times))
+        steps = []
+        self.assertEqual(loop.run_ticks(lambda: steps.append(1)), 0)
+        self.assertEqual(loop.run_ticks(lambda: steps.append(1)), 2)
+        self.assertEqual(len(steps), 2)
+
+    def test_uncapped(self):
+        clock = [0]
+
+        def step():
+            clock[0] += 0.001
+
+        loop = FixedTimestepLoop(tick_rate=10, max_catch_up_ticks=4,
+                                 uncapped=True, fps=10,
+                                 timer=lambda: clock[0])
+        # Такты выполняются подряд до времени следующего кадра, без лимита
+        # max_catch_up_ticks
+        self.assertEqual(loop.run_ticks(step), 100)
+        self.assertEqual(loop.alpha, 1)
+
+
+class TestBenchmark(unittest.TestCase):
+    """Проверка бенчмарка такта игры."""
+
+    def test_run_benchmark(self):
+        config = dict(DEFAULT_CONFIG, bots=3, length=20, food=100,
+                      map_size=800)
+        game = create_game(config, seed=1)
+        self.assertEqual(len(game.get_snakes()), 3)
+        self.assertTrue(all(snake.length == 20
+                            for snake in game.get_snakes()))
+
+        result = run_benchmark(config, ticks=10, seed=1, memory=False)
+        self.assertEqual(result['config']['bots'], 3)
+        self.assertGreater(result['ticks_per_second'], 0)
+        self.assertLessEqual(result['tick_ms']['p50'],
+                             result['tick_ms']['p99'])
+        self.assertEqual(
+            set(result['phases']),
+            set(GameLogic.profiled_phases) | {'draw'})
+        # Тот же результат игры при том же зерне
+        self.assertEqual(
+            run_benchmark(config, ticks=10, seed=1, draw=False,
+                          memory=False)['snakes_alive'],
+            result['snakes_alive'])
+
+
+class TestPhaseProfiler(unittest.TestCase):
+    """Проверка подключения и отключения профилировщика."""
+
+    def test_attach_detach(self):
+        game = GameLogic(with_player=False)
+        profiler = PhaseProfiler(window=5)
+        profiler.attach(game, GameLogic.profiled_phases)
+        for _ in range(8):
+            game.step()
+        stats = profiler.get_stats()
+        self.assertEqual(set(stats), set(GameLogic.profiled_phases))
+        self.assertEqual(stats['collisions']['calls'], 8)
+        self.assertEqual(sum(stats['collisions']['histogram']), 5)
+
+        profiler.detach()
+        self.assertFalse(set(GameLogic.profiled_phases.values()) & set(
+            vars(game)))
+
+
+class TestTickScheduler(unittest.TestCase):
+    """Проверка сроков по тактам и пропуска устаревших сроков."""
+
+    def test_pop_due(self):
+        scheduler = TickScheduler()
+        scheduler.schedule('a', 5)
+        scheduler.schedule('b', 3)
+        scheduler.schedule('c', 3)
+        # Перенос и отмена делают прежние записи устаревшими
+        scheduler.schedule('a', 10)
+        scheduler.cancel('c')
+        self.assertEqual(scheduler.pop_due(2), [])
+        self.assertEqual(scheduler.pop_due(5), ['b'])
+        self.assertEqual(scheduler.pop_due(9), [])
+        scheduler.tick = 10
+        self.assertEqual(scheduler.pop_due(), ['a'])
+        self.assertEqual(len(scheduler), 0)
+
+
+class TestReplay(unittest.TestCase):
+    """Проверка воспроизведения игры по записи."""
+
+    def test_play(self):
+        game = GameLogic(seed=9)
+        recorder = ReplayRecorder(game)
+        inputs = {10: {'turning': 'left', 'boost': True},
+                  40: {'turning': None}, 70: {'boost': False}}
+        for tick in range(100):
+            game.step(inputs.get(tick))
+
+        replay = Replay.from_bytes(recorder.replay.to_bytes())
+        self.assertEqual(replay.ticks, 100)
+        self.assertEqual(replay.get_inputs(), inputs)
+        self.assertEqual(play(replay).get_state(), game.get_state())
+
+
+class TestEnv(unittest.TestCase):
+    """Проверка среды для обучения."""
+
+    def test_border(self):
+        env = SnakeEnv(bots_count=0, width=400, height=400, seed=1)
+        observation, _ = env.reset()
+        self.assertEqual(len(observation), env.observation_size)
+        # Змея едет прямо, пока не выйдет за границу
+        front_proximity = []
+        terminated = False
+        while not terminated:
+            front_proximity.append(observation[0])
+            observation, reward, terminated, truncated, info = env.step(0)
+            self.assertFalse(truncated)
+        self.assertEqual(reward, env.death_reward)
+        self.assertEqual(info['episode']['length'], len(front_proximity))
+        self.assertEqual(front_proximity[0], 0)
+        self.assertEqual(front_proximity[-1], 1)
+
+    def test_observation_is_read_only(self):
+        observed, blind = SnakeEnv(seed=6), SnakeEnv(seed=6)
+        observed.reset()
+        blind.reset()
+        for step in range(60):
+            action = step % observed.actions_count
+            observation = observed.step(action)[0]
+            blind.advance(action)
+            self.assertEqual(observed.get_observation(), observation)
+        # Построение наблюдений не влияет на игру
+        game = observed.game
+        self.assertNotIn(game.snake.id, game.targeting.candidates)
+        self.assertEqual(game.get_state(), blind.game.get_state())
+
+    def test_vec_env(self):
+        results = []
+        for _ in range(2):
+            envs = VecEnv(3, seed=4, bots_count=2, max_steps=30)
+            observations, _ = envs.reset()
+            self.assertEqual(len(observations), 3 * envs.observation_size)
+            rng = random.Random(0)
+            episodes = 0
+            for _ in range(40):
+                observations, rewards, terminated, truncated, infos = (
+                    envs.step([rng.randrange(envs.actions_count)
+                               for _ in range(len(envs))]))
+                episodes += sum(1 for info in infos if info)
+            # Эпизоды заканчиваются не позже max_steps и начинаются заново
+            self.assertGreaterEqual(episodes, 3)
+            results.append(list(observations))
+        self.assertEqual(results[0], results[1])
+
+
+class TestSnapshot(unittest.TestCase):
+    """Проверка продолжения игры со снимка."""
+
+    def setUp(self):
+        # Игра из модулей, которые использует snapshot (модули игры
+        # импортируют друг друга без имени пакета)
+        self.game = snapshot.GameLogic(
+            with_player=False, bots_count=12, seed=5)
+        for _ in range(200):
+            self.game.step()
+        self.data = Snapshot.from_game(self.game).to_bytes()
+
+    def assert_same_game(self, game):
+        for _ in range(300):
+            self.assertEqual(game.step(), self.game.step())
+        self.assertEqual(game.deaths, self.game.deaths)
+        self.assertEqual(Snapshot.from_game(game).to_bytes(),
+                         Snapshot.from_game(self.game).to_bytes())
+
+    def test_from_bytes(self):
+        game_snapshot = Snapshot.from_bytes(self.data)
+        # Разделы ссылаются на исходный буфер
+        self.assertIsInstance(game_snapshot[b'SNKX'], memoryview)
+        self.assertEqual(game_snapshot.get_game_info()['tick'], 200)
+        self.assert_same_game(game_snapshot.create_game())
+
+    def test_mmap(self):
+        fd, path = tempfile.mkstemp(suffix='.snapshot')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        Snapshot.from_game(self.game).save(path)
+        game_snapshot = Snapshot.load(path)
+        self.assertEqual(game_snapshot.to_bytes(), self.data)
+        self.assert_same_game(game_snapshot.create_game())
+
+
+class TestRunner(unittest.TestCase):
+    """Проверка прогона матчей без окна."""
+
+    def test_run_match(self):
+        job = get_jobs(1, ticks=100, bots=6, seed=3)[0]
+        result = run_match(job)
+        self.assertEqual(result['ticks'], 100)
+        self.assertEqual(len(result['final_lengths']), 6)
+        deaths = sum(result['deaths_by_cause'].values())
+        self.assertEqual(len(result['survival_ticks']), 6 + deaths)
+        # Матч с тем же зерном дает тот же результат
+        self.assertEqual(run_match(job)['survival_ticks'],
+                         result['survival_ticks'])
+
+    def test_overrides(self):
+        results = list(run_matches(
+            2, ticks=10, bots=2, processes=1,
+            overrides={'BotSnake.probe_distance': 70}))
+        self.assertEqual(len(results), 2)
+        with overridden({'BotSnake.max_radius': 20}):
+            from snake.runner import BotSnake
+            self.assertEqual(BotSnake.max_radius, 20)
+        self.assertNotIn('max_radius', vars(BotSnake))
+        with self.assertRaises(ValueError):
+            with overridden({'BotSnake.unknown': 1}):
+                pass
+
+    def test_settings_overrides(self):
+        logics = sys.modules['logics']
+        tick_rate = logics.TICK_RATE
+        with overridden({'settings.TICK_RATE': tick_rate * 2}):
+            self.assertEqual(logics.TICK_RATE, tick_rate * 2)
+            self.assertEqual(sys.modules['settings'].TICK_RATE, tick_rate * 2)
+        self.assertEqual(logics.TICK_RATE, tick_rate)
+        with self.assertRaises(ValueError):
+            with overridden({'settings.UNKNOWN': 1}):
+                pass
+
+    def test_sweep(self):
+        points = get_sweep_points({'BotSnake.probe_distance': 70}, {
+            'BotSnake.food_delta_seconds': [1, 2],
+            'settings.TICK_RATE': [30, 60]})
+        self.assertEqual(len(points), 4)
+        with mock.patch('snake.runner.GameLogic',
+                        wraps=GameLogic) as game_logic:
+            results = list(run_matches(
+                2, ticks=10, bots=2, processes=1, overrides=points,
+                food_count=50, width=600, height=700))
+        self.assertEqual(len(results), 8)
+        # Для каждой точки перебора - матчи с одними и теми же зернами
+        for number, point in enumerate(points):
+            point_results = [r for r in results if r['point'] == number]
+            self.assertEqual([r['seed'] for r in point_results], [0, 1])
+            self.assertTrue(all(r['overrides'] == point
+                                for r in point_results))
+        self.assertEqual(game_logic.call_count, 8)
+        for call in game_logic.call_args_list:
+            self.assertEqual(
+                (call.kwargs['food_count'], call.kwargs['width'],
+                 call.kwargs['height']), (50, 600, 700))
+
+
+class TestServer(unittest.TestCase):
+    """Проверка сервера с клиентами-ботами через localhost."""
+
+    async def play(self, ticks):
+        server = GameServer(bots_count=40, width=4000, height=4000, seed=2)
+        port = await server.start('127.0.0.1', 0)
+        clients = [BotClient() for _ in range(3)]
+        for client in clients:
+            await client.connect('127.0.0.1', port)
+        while len(server.clients) < len(clients):
+            await asyncio.sleep(0.01)
+
+        angles = set()
+        for _ in range(ticks):
+            server.tick()
+            for client in clients:
+                await client.receive_state()
+            # Сервер получает ввод клиентов
+            await asyncio.sleep(0.001)
+            angles.update(c.snake.angle for c in server.clients if c.snake)
+
+        for client, server_client in zip(clients, server.clients):
+            # Состояние, собранное из обновлений, совпадает с полным
+            expected = ClientWorld()
+            expected.apply(ClientView().get_update(
+                server.game, server.build_snakes_grid(),
+                server_client.center)[0])
+            self.assertEqual(client.world.tick, server.game.tick)
+            self.assertEqual(client.world.snakes, expected.snakes)
+            self.assertEqual(client.world.food, expected.food)
+            # Клиент получает только ближайших змей и еду
+            self.assertLess(len(client.world.snakes),
+                            len(server.game.get_snakes()))
+            self.assertLess(len(client.world.food),
+                            len(server.game.food_container.objects))
+        for client in clients:
+            await client.close()
+        await server.close()
+        return angles
+
+    def test_death_without_record(self):
+        server = GameServer(bots_count=2, seed=2)
+        writer = mock.Mock()
+        writer.is_closing.return_value = False
+        writer.transport.get_write_buffer_size.return_value = 0
+        client = Client(None, writer, ClientView())
+        server.clients.append(client)
+        server.tick()
+        snake = client.snake
+        # Змея убрана из игры без записи о гибели
+        snake.is_alive = False
+        server.game.snake_container.delete_by_id(snake.id)
+        with mock.patch.object(server, 'send', wraps=server.send) as send:
+            server.tick()
+        self.assertIsNone(client.snake)
+        death = send.call_args_list[0].args[1]
+        self.assertEqual((death['type'], death['cause'], death['length']),
+                         ('death', None, snake.length))
+
+    def test_bot_clients(self):
+        angles = asyncio.run(self.play(60))
+        # Змеи игроков поворачивают по вводу клиентов
+        self.assertGreater(len(angles), 1)
+
+
 if __name__ == '__main__':
     unittest.main()